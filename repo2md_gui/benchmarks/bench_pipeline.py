@@ -0,0 +1,263 @@
+"""repo2md_gui 各阶段基准测试
+
+在合成仓库上分别计时扫描、建树模型、过滤代理、目录树渲染与 Markdown 生成，
+结果写入 JSON 文件，可用 --compare 与上一次的结果对比。
+
+用法：
+    python benchmarks/bench_pipeline.py --files 5000 --output bench.json
+    python benchmarks/bench_pipeline.py --files 5000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 无界面运行 Qt
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6 import __version__ as PYSIDE_VERSION  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+import repo2md_gui  # noqa: E402
+from repo2md_gui import ScanThread, GenerateThread, MainWindow  # noqa: E402
+from synthetic_repo import SIZE_DISTRIBUTIONS, make_synthetic_paths, make_synthetic_repo  # noqa: E402
+
+
+def _time(func, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return {
+        'runs': runs,
+        'min': min(runs),
+        'median': statistics.median(runs),
+        'mean': statistics.mean(runs),
+    }
+
+
+def _count_proxy_rows(proxy, parent):
+    """遍历代理模型，强制对每一层执行 filterAcceptsRow"""
+    total = 0
+    for row in range(proxy.rowCount(parent)):
+        index = proxy.index(row, 0, parent)
+        total += 1 + _count_proxy_rows(proxy, index)
+    return total
+
+
+def bench_render_tree(count, repeat):
+    """纯内存的大规模目录树渲染（默认 50 万条路径）"""
+    paths = make_synthetic_paths(count)
+    sizes = dict.fromkeys(paths, 1024)
+    results = {
+        'render_tree': _time(lambda: repo2md_gui.render_tree(paths, 'repo'), repeat),
+        'render_tree_annotated': _time(
+            lambda: repo2md_gui.render_tree(paths, 'repo', sizes=sizes, annotate=True), repeat),
+        'render_tree_limited': _time(
+            lambda: repo2md_gui.render_tree(paths, 'repo', max_depth=3, max_width=50), repeat),
+    }
+    for stats in results.values():
+        stats['paths'] = count
+    return results
+
+
+def run_benchmarks(root, repeat, stages, tmp_dir, init_git=False):
+    """tmp_dir: 存放 stream_* 输出的临时目录；
+    init_git: 没有 git 仓库时在 root 中建立 index，只用于临时的合成仓库；--repo 指定的目录不做任何修改"""
+    results = {}
+    window = MainWindow()
+    window.root_path = root
+
+    scan_result = {}
+
+    def scan():
+        thread = ScanThread(root)
+        thread.finished_scan.connect(lambda fm, ext, agg: scan_result.update(file_map=fm, extensions=ext))
+        thread.run()
+
+    if 'scan' in stages:
+        results['scan'] = _time(scan, repeat)
+    else:
+        scan()
+    if 'scan_git' in stages and init_git and shutil.which('git') and not os.path.isdir(os.path.join(root, '.git')):
+        # 在合成仓库中建立 git index（不提交），计时从 index 读取文件列表
+        subprocess.run(['git', 'init', '-q', root], check=True)
+        subprocess.run(['git', '-C', root, 'add', '-A'], check=True)
+    if 'scan_git' in stages and repo2md_gui.find_git_dir(root)[0] is not None:
+        def scan_git():
+            thread = ScanThread(root, source='git')
+            thread.finished_scan.connect(lambda fm, ext, agg: None)
+            thread.run()
+
+        results['scan_git'] = _time(scan_git, repeat)
+
+    file_map = scan_result['file_map']
+    extensions = scan_result['extensions']
+    window.file_map = file_map
+    selected = sorted(file_map)
+
+    def build_model():
+        window.tree_model.clear()
+        window.build_tree_model()
+
+    if 'build_tree_model' in stages:
+        results['build_tree_model'] = _time(build_model, repeat)
+    else:
+        build_model()
+
+    if 'open_session' in stages:
+        # 从会话快照重建文件树并恢复一半文件的选中状态（不访问文件系统）
+        session = dict(window.collect_session(), selection=selected[::2])
+        results['open_session'] = _time(lambda: window.apply_session(session), repeat)
+
+    if 'filter_proxy' in stages:
+        proxy = window.proxy_model
+        half = extensions[::2] or extensions
+
+        def filter_proxy():
+            proxy.set_allowed_extensions(half)
+            proxy.set_search_text('f1')
+            _count_proxy_rows(proxy, repo2md_gui.QModelIndex())
+            proxy.set_search_text('')
+            proxy.set_allowed_extensions(extensions)
+
+        results['filter_proxy'] = _time(filter_proxy, repeat)
+
+    gen = GenerateThread(root, selected, file_map, 'zh', False)
+    if 'build_tree' in stages:
+        results['build_tree'] = _time(lambda: gen._build_tree(selected), repeat)
+
+    cache = repo2md_gui.ContentCache()
+    variants = {
+        'generate': (False, {}),
+        'generate_redact': (True, {}),
+        # 去重 + 共享内容缓存（第一轮之后命中缓存）
+        'generate_dedup_cached': (False, {'dedup': True, 'content_cache': cache}),
+        'generate_compact': (False, {'compact': True, 'workers': repo2md_gui.DEFAULT_READ_WORKERS}),
+        # 大文件只输出大纲（第一轮之后大纲命中缓存）
+        'generate_outline': (False, {'outline_threshold': 8192, 'content_cache': repo2md_gui.ContentCache()}),
+    }
+    for name, (redact, options) in variants.items():
+        if name not in stages:
+            continue
+        out = {}
+
+        def generate():
+            thread = GenerateThread(root, selected, file_map, 'zh', redact, **options)
+            thread.result.connect(lambda md: out.update(size=len(md)))
+            thread.run()
+
+        results[name] = _time(generate, repeat)
+        results[name]['output_chars'] = out.get('size', 0)
+
+    # 流式写出：压缩在写线程中进行，理想情况下耗时接近不压缩
+    for compression in (None, 'gzip', 'zstd'):
+        name = f"stream_{compression or 'plain'}"
+        if name not in stages or (compression == 'zstd' and repo2md_gui.zstd_module() is None):
+            continue
+        target = os.path.join(tmp_dir, 'out.md' + repo2md_gui.COMPRESSION_SUFFIXES.get(compression, ''))
+        written = {}
+
+        def stream():
+            gen = repo2md_gui.MarkdownGenerator(root, selected, file_map, 'zh', False)
+            written.update(repo2md_gui.write_sections(gen.iter_sections(), target, compression))
+
+        results[name] = _time(stream, repeat)
+        results[name]['output_bytes'] = written['bytes_out']
+
+    window.deleteLater()
+    return results, len(file_map), sum(size for _, size, *_ in file_map.values())
+
+
+def compare(current, previous_path):
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    print(f"\n对比 {previous_path}（median，当前/上次）:")
+    for name, stats in current['stages'].items():
+        old = previous.get('stages', {}).get(name)
+        if not old:
+            print(f"  {name:<20} {stats['median']*1000:10.1f} ms   (无历史数据)")
+            continue
+        ratio = stats['median'] / old['median'] if old['median'] else float('inf')
+        print(f"  {name:<20} {stats['median']*1000:10.1f} ms  {old['median']*1000:10.1f} ms  x{ratio:.2f}")
+
+
+ALL_STAGES = ['scan', 'scan_git', 'build_tree_model', 'open_session', 'filter_proxy', 'build_tree', 'generate', 'generate_redact',
+              'generate_dedup_cached', 'generate_compact', 'generate_outline', 'stream_plain', 'stream_gzip', 'stream_zstd', 'render_tree']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--width', type=int, default=4)
+    parser.add_argument('--size-distribution', choices=SIZE_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--mean-size', type=int, default=4096)
+    parser.add_argument('--max-size', type=int, default=4 * 1024 * 1024)
+    parser.add_argument('--binary-ratio', type=float, default=0.05)
+    parser.add_argument('--non-utf8-ratio', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tree-paths', type=int, default=500000, help='render_tree 阶段使用的路径数')
+    parser.add_argument('--stages', default=','.join(ALL_STAGES),
+                        help='逗号分隔，可选: ' + ','.join(ALL_STAGES))
+    parser.add_argument('--repo', help='使用已有目录而不是生成合成仓库')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='与之前的结果文件对比')
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    shape = {k: getattr(args, k) for k in (
+        'files', 'depth', 'width', 'size_distribution', 'mean_size', 'max_size',
+        'binary_ratio', 'non_utf8_ratio', 'seed')}
+    stages = [s for s in args.stages.split(',') if s]
+
+    with tempfile.TemporaryDirectory(prefix='repo2md_bench_') as tmp:
+        if args.repo:
+            root = os.path.abspath(args.repo)
+            shape = {'repo': root}
+        else:
+            root = os.path.join(tmp, 'repo')
+            make_synthetic_repo(root, **shape)
+        stage_results, file_count, total_bytes = run_benchmarks(root, args.repeat, stages, tmp, init_git=not args.repo)
+    if 'render_tree' in stages:
+        stage_results.update(bench_render_tree(args.tree_paths, args.repeat))
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pyside6': PYSIDE_VERSION,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'shape': shape,
+            'file_count': file_count,
+            'total_bytes': total_bytes,
+        },
+        'stages': stage_results,
+    }
+
+    print(f"{file_count} 个文件, {repo2md_gui.format_bytes(total_bytes)}")
+    for name, stats in stage_results.items():
+        print(f"  {name:<20} min {stats['min']*1000:10.1f} ms   median {stats['median']*1000:10.1f} ms")
+
+    if args.compare:
+        compare(report, args.compare)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已写入 {args.output}")
+    del app
+
+
+if __name__ == '__main__':
+    main()
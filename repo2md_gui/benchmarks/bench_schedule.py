@@ -0,0 +1,158 @@
+"""文件读取调度基准：按输入顺序（iter_ordered）与按大小调度（iter_scheduled，LPT + 小文件成批）
+
+三种测量：
+  model     按列表调度模型计算理论完成时间（不依赖 CPU 核数，结果确定）
+  simulate  每个文件 sleep(固定开销 + 大小 / 吞吐量) 模拟 I/O，实测完成时间与首个结果的延迟
+  generate  在合成仓库上用 MarkdownGenerator._render_file 实际读取并渲染文件
+
+用法：
+    python benchmarks/bench_schedule.py --files 2000 --workers 8 --distributions pareto,lognormal
+    python benchmarks/bench_schedule.py --modes model,simulate --huge-last-mb 8 --output schedule.json
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import repo2md_gui  # noqa: E402
+from synthetic_repo import SIZE_DISTRIBUTIONS, make_synthetic_repo, sample_size  # noqa: E402
+
+
+def sample_sizes(distribution, files, mean_size, max_size, seed, huge_last=0):
+    rng = random.Random(seed)
+    sizes = [sample_size(rng, distribution, mean_size, max_size) for _ in range(files)]
+    if huge_last:
+        sizes[-1] = huge_last   # 最坏情况：一个超大文件排在最后
+    return sizes
+
+
+def list_schedule(durations, workers):
+    """贪心列表调度：任务按给定顺序交给最先空闲的线程，返回完成时间"""
+    free_at = [0.0] * workers
+    for duration in durations:
+        heapq.heappush(free_at, heapq.heappop(free_at) + duration)
+    return max(free_at)
+
+
+def model_makespans(sizes, workers, overhead_s, throughput, dispatch_s):
+    """理论完成时间（秒）：每个任务另加一次派发开销 dispatch_s"""
+    cost = [overhead_s + size / throughput for size in sizes]
+    naive = list_schedule([c + dispatch_s for c in cost], workers)
+    tasks = repo2md_gui.plan_tasks(sizes, workers)
+    scheduled = list_schedule([sum(cost[i] for i in indices) + dispatch_s for _, indices in tasks], workers)
+    lower_bound = max(sum(cost) / workers, max(cost))
+    return {'naive': naive, 'scheduled': scheduled, 'lower_bound': lower_bound, 'tasks': len(tasks)}
+
+
+def _consume(iterator):
+    """完整消费结果，返回 (总耗时, 首个结果延迟)"""
+    start = time.perf_counter()
+    first = None
+    for _ in iterator:
+        if first is None:
+            first = time.perf_counter() - start
+    return time.perf_counter() - start, first
+
+
+def _timed(func, repeat):
+    runs = [func() for _ in range(repeat)]
+    return {
+        'makespan': statistics.median(r[0] for r in runs),
+        'first_result': statistics.median(r[1] for r in runs),
+    }
+
+
+def simulate(sizes, workers, overhead_s, throughput, repeat):
+    def work(i):
+        time.sleep(overhead_s + sizes[i] / throughput)
+        return i
+
+    items = list(range(len(sizes)))
+    return {
+        'naive': _timed(lambda: _consume(repo2md_gui.iter_ordered(work, items, workers)), repeat),
+        'scheduled': _timed(lambda: _consume(repo2md_gui.iter_scheduled(work, items, sizes, workers)), repeat),
+    }
+
+
+def generate(root, workers, repeat):
+    file_map, _ = repo2md_gui.scan_directory(root)
+    paths = sorted(file_map)
+    sizes = [file_map[p][1] for p in paths]
+    generator = repo2md_gui.MarkdownGenerator(root, paths, file_map, 'zh', False)
+    render = generator._render_file
+    return {
+        'naive': _timed(lambda: _consume(repo2md_gui.iter_ordered(render, paths, workers)), repeat),
+        'scheduled': _timed(lambda: _consume(repo2md_gui.iter_scheduled(render, paths, sizes, workers)), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--distributions', default='pareto,lognormal,uniform',
+                        help='逗号分隔，可选: ' + ','.join(SIZE_DISTRIBUTIONS))
+    parser.add_argument('--mean-size', type=int, default=8192)
+    parser.add_argument('--max-size', type=int, default=16 * 1024 * 1024)
+    parser.add_argument('--huge-last-mb', type=float, default=0, help='把最后一个文件设为该大小（MB），模拟排在末尾的大文件')
+    parser.add_argument('--overhead-us', type=float, default=100, help='模拟的每个文件固定开销（微秒）')
+    parser.add_argument('--throughput-mb', type=float, default=200, help='模拟的读取吞吐量（MB/s）')
+    parser.add_argument('--dispatch-us', type=float, default=30, help='模型中每个任务的派发开销（微秒）')
+    parser.add_argument('--modes', default='model,simulate,generate')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_schedule.json')
+    args = parser.parse_args()
+
+    modes = [m for m in args.modes.split(',') if m]
+    overhead_s = args.overhead_us / 1e6
+    throughput = args.throughput_mb * 1024 * 1024
+    report = {'meta': {k: v for k, v in vars(args).items() if k != 'output'}, 'results': {}}
+
+    for distribution in [d for d in args.distributions.split(',') if d]:
+        huge_last = int(args.huge_last_mb * 1024 * 1024)
+        sizes = sample_sizes(distribution, args.files, args.mean_size, args.max_size, args.seed, huge_last)
+        result = {'total_bytes': sum(sizes), 'max_bytes': max(sizes)}
+        print(f"\n{distribution}: {args.files} 个文件, 共 {repo2md_gui.format_bytes(sum(sizes))}, "
+              f"最大 {repo2md_gui.format_bytes(max(sizes))}, {args.workers} 线程")
+        if 'model' in modes:
+            model = model_makespans(sizes, args.workers, overhead_s, throughput, args.dispatch_us / 1e6)
+            result['model'] = model
+            print(f"  model     naive {model['naive']*1000:9.1f} ms   scheduled {model['scheduled']*1000:9.1f} ms"
+                  f"   下界 {model['lower_bound']*1000:9.1f} ms   ({model['tasks']} 个任务)")
+        if 'simulate' in modes:
+            sim = simulate(sizes, args.workers, overhead_s, throughput, args.repeat)
+            result['simulate'] = sim
+            print(f"  simulate  naive {sim['naive']['makespan']*1000:9.1f} ms   "
+                  f"scheduled {sim['scheduled']['makespan']*1000:9.1f} ms   "
+                  f"首个结果 {sim['naive']['first_result']*1000:.1f} / {sim['scheduled']['first_result']*1000:.1f} ms")
+        if 'generate' in modes:
+            with tempfile.TemporaryDirectory(prefix='repo2md_sched_') as tmp:
+                root = os.path.join(tmp, 'repo')
+                make_synthetic_repo(root, files=args.files, size_distribution=distribution,
+                                    mean_size=args.mean_size, max_size=args.max_size, seed=args.seed)
+                if huge_last:
+                    with open(os.path.join(root, 'zz_huge.txt'), 'w', encoding='utf-8') as f:
+                        f.write(('x' * 99 + '\n') * (huge_last // 100))
+                gen = generate(root, args.workers, args.repeat)
+            result['generate'] = gen
+            print(f"  generate  naive {gen['naive']['makespan']*1000:9.1f} ms   "
+                  f"scheduled {gen['scheduled']['makespan']*1000:9.1f} ms")
+        report['results'][distribution] = result
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
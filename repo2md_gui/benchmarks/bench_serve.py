@@ -0,0 +1,185 @@
+"""服务模式（--serve）本地压测：统计每秒请求数与延迟分布
+
+默认在合成仓库上启动一个服务子进程（端口自动选择），预热后用多个持久连接并发请求，
+结束后关闭服务；也可以用 --url 压测已在运行的服务。
+
+用法：
+    python benchmarks/bench_serve.py --files 2000 --concurrency 4 --requests 200
+    python benchmarks/bench_serve.py --url http://127.0.0.1:8765 --query "ext=py&max_tokens=20000"
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'repo2md_gui.py')
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_repo import SIZE_DISTRIBUTIONS, make_synthetic_repo  # noqa: E402
+
+
+def start_server(root, workers, timeout=60):
+    """启动服务子进程，返回 (进程, 基础 URL)"""
+    cmd = [sys.executable, APP, '--serve', '--root', root, '--port', '0']
+    if workers:
+        cmd += ['--workers', str(workers)]
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env)
+    deadline = time.time() + timeout
+    url = None
+    while time.time() < deadline:
+        line = proc.stdout.readline()
+        if not line:
+            break
+        match = re.search(r'http://[\w.:]+', line)
+        if match:
+            url = match.group(0)
+        if url and '已索引' in line:    # 首次扫描完成
+            # 持续读取输出，避免管道写满阻塞服务
+            threading.Thread(target=proc.stdout.read, daemon=True).start()
+            return proc, url
+    proc.kill()
+    raise RuntimeError("服务启动失败")
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run_load(url, target, concurrency, total, warmup):
+    parts = urlsplit(url)
+    latencies = []
+    errors = []
+    received = [0]
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def request(conn):
+        conn.request('GET', target)
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status}: {body[:200]!r}")
+        return len(body)
+
+    def worker():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=120)
+        try:
+            while True:
+                with lock:
+                    if next(counter, None) is None:
+                        return
+                start = time.perf_counter()
+                try:
+                    size = request(conn)
+                except Exception as e:  # noqa: BLE001 - 记录后继续压测
+                    with lock:
+                        errors.append(str(e))
+                    conn.close()
+                    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=120)
+                    continue
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    received[0] += size
+        finally:
+            conn.close()
+
+    # 预热：填充服务端内容缓存
+    warm = http.client.HTTPConnection(parts.hostname, parts.port, timeout=120)
+    for _ in range(warmup):
+        request(warm)
+    warm.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    result = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'wall_seconds': wall,
+        'rps': len(latencies) / wall if wall else 0,
+        'bytes_per_second': received[0] / wall if wall else 0,
+        'bytes_per_response': received[0] / len(latencies) if latencies else 0,
+    }
+    if latencies:
+        result['latency_ms'] = {
+            'min': min(latencies) * 1000,
+            'p50': percentile(latencies, 50) * 1000,
+            'p90': percentile(latencies, 90) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'max': max(latencies) * 1000,
+            'mean': statistics.mean(latencies) * 1000,
+        }
+    if errors:
+        result['first_errors'] = errors[:5]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='压测已在运行的服务，不启动子进程')
+    parser.add_argument('--repo', help='使用已有目录而不是生成合成仓库')
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--size-distribution', choices=SIZE_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--mean-size', type=int, default=4096)
+    parser.add_argument('--path', default='/generate', help='请求路径：/generate、/files 或 /roots')
+    parser.add_argument('--query', default='ext=py,md,txt&max_tokens=50000', help='查询字符串')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--workers', type=int, help='服务端每个请求读取文件的线程数')
+    parser.add_argument('--output', default='bench_serve.json')
+    args = parser.parse_args()
+
+    target = args.path + ('?' + args.query if args.query else '')
+    proc = None
+    with tempfile.TemporaryDirectory(prefix='repo2md_serve_') as tmp:
+        try:
+            if args.url:
+                url = args.url.rstrip('/')
+            else:
+                root = os.path.abspath(args.repo) if args.repo else os.path.join(tmp, 'repo')
+                if not args.repo:
+                    make_synthetic_repo(root, files=args.files, size_distribution=args.size_distribution,
+                                        mean_size=args.mean_size)
+                proc, url = start_server(root, args.workers)
+            result = run_load(url, target, args.concurrency, args.requests, args.warmup)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    result['meta'] = {k: v for k, v in vars(args).items() if k != 'output'}
+    print(f"{url}{target}")
+    print(f"  {result['requests']} 个请求（{result['errors']} 个错误），并发 {args.concurrency}，"
+          f"耗时 {result['wall_seconds']:.2f}s")
+    print(f"  {result['rps']:.1f} 请求/秒，平均响应 {result['bytes_per_response'] / 1024:.1f} KB")
+    if 'latency_ms' in result:
+        lat = result['latency_ms']
+        print(f"  延迟 ms: min {lat['min']:.1f}  p50 {lat['p50']:.1f}  p90 {lat['p90']:.1f}  "
+              f"p99 {lat['p99']:.1f}  max {lat['max']:.1f}")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已写入 {args.output}")
+    return 1 if result['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
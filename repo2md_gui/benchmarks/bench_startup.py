@@ -0,0 +1,106 @@
+"""repo2md_gui 启动时间基准
+
+每次在新的子进程中导入模块、创建并显示主窗口，统计从启动进程到窗口显示的耗时。
+中位数超过 --budget-ms 时以非零状态退出，可放在 CI 中防止启动变慢。
+
+用法：
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1500
+    python benchmarks/bench_startup.py --importtime      # 额外列出自身耗时最多的导入
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程：分别记录导入模块与显示窗口的耗时，输出一行 JSON
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+import repo2md_gui
+imported = time.perf_counter()
+from PySide6.QtWidgets import QApplication
+app = QApplication([sys.argv[0]])
+window = repo2md_gui.MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'window': shown - imported,
+                   'optional_loaded': sorted(k for k, v in repo2md_gui._optional_modules.items() if v)}}))
+'''
+
+
+def _child_env():
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+def run_once():
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', CHILD.format(app_dir=APP_DIR)],
+                          capture_output=True, text=True, env=_child_env())
+    total = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['total'] = total
+    return result
+
+
+def top_imports(limit=15):
+    """用 -X importtime 找出自身耗时最多的模块"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD.format(app_dir=APP_DIR)],
+                          capture_output=True, text=True, env=_child_env())
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1500, help='进程启动到窗口显示的中位数上限')
+    parser.add_argument('--importtime', action='store_true', help='列出自身耗时最多的导入')
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    report = {'budget_ms': args.budget_ms, 'runs': runs}
+    for key in ('import', 'window', 'total'):
+        values = [r[key] for r in runs]
+        report[key] = {'min': min(values), 'median': statistics.median(values)}
+        print(f"  {key:<8} min {min(values)*1000:8.1f} ms   median {statistics.median(values)*1000:8.1f} ms")
+    loaded = runs[-1]['optional_loaded']
+    if loaded:
+        print(f"  启动时已加载的可选模块: {', '.join(loaded)}（应为空，首次使用时再加载）")
+
+    if args.importtime:
+        print("\n自身耗时最多的导入（self / cumulative, ms）:")
+        for self_us, cumulative_us, name in top_imports():
+            print(f"  {self_us/1000:8.1f} {cumulative_us/1000:8.1f}  {name}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    median_ms = report['total']['median'] * 1000
+    if median_ms > args.budget_ms:
+        print(f"\n超出启动预算：{median_ms:.1f} ms > {args.budget_ms:.0f} ms")
+        return 1
+    print(f"\n启动预算内：{median_ms:.1f} ms <= {args.budget_ms:.0f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
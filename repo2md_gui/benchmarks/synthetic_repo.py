@@ -0,0 +1,107 @@
+"""合成仓库生成器：按给定形状生成可复现的测试目录，供基准测试使用"""
+import os
+import random
+import string
+
+# 文本文件扩展名（按权重随机选取）
+TEXT_EXTENSIONS = ['py', 'js', 'ts', 'md', 'json', 'txt', 'html', 'css', 'yaml', 'c', 'h', '']
+
+# 二进制文件：一部分靠扩展名识别，一部分只能靠魔数识别
+BINARY_SAMPLES = [
+    ('png', b'\x89PNG\r\n\x1a\n'),
+    ('zip', b'PK\x03\x04'),
+    ('res', b'\x89PNG\r\n\x1a\n'),
+    ('blob', b'\x1F\x8B\x08\x00'),
+]
+
+SIZE_DISTRIBUTIONS = ('uniform', 'lognormal', 'pareto', 'fixed')
+
+_WORDS = ['def', 'class', 'return', 'import', 'value', 'result', 'config', 'index',
+          'items', 'self', 'data', 'path', 'name', 'node', 'for', 'in', 'if', 'else']
+
+
+def sample_size(rng, distribution, mean_size, max_size):
+    """按分布采样单个文件大小（字节）"""
+    if distribution == 'fixed':
+        size = mean_size
+    elif distribution == 'uniform':
+        size = rng.randint(0, mean_size * 2)
+    elif distribution == 'lognormal':
+        # 中位数约为 mean_size / 2，长尾
+        size = int(rng.lognormvariate(0, 1.2) * mean_size / 2)
+    elif distribution == 'pareto':
+        # alpha=1.5 时少数文件占据绝大部分体积
+        size = int(mean_size / 3 * rng.paretovariate(1.5))
+    else:
+        raise ValueError(f"未知的大小分布: {distribution}")
+    return max(0, min(size, max_size))
+
+
+def _text_body(rng, size):
+    lines = []
+    total = 0
+    while total < size:
+        indent = '    ' * rng.randint(0, 3)
+        line = indent + ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(2, 10)))
+        lines.append(line)
+        total += len(line) + 1
+    return '\n'.join(lines)[:size]
+
+
+def _dir_paths(rng, depth, width):
+    """生成深度不超过 depth、每层最多 width 个子目录的目录列表（含根目录 ''）"""
+    dirs = ['']
+    level = ['']
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            for w in range(rng.randint(1, width)):
+                name = f"d{d}_{w}_" + ''.join(rng.choice(string.ascii_lowercase) for _ in range(3))
+                next_level.append(f"{parent}/{name}" if parent else name)
+        dirs.extend(next_level)
+        level = next_level
+    return dirs
+
+
+def make_synthetic_repo(root, files=1000, depth=4, width=4, size_distribution='lognormal',
+                        mean_size=4096, max_size=4 * 1024 * 1024, binary_ratio=0.05,
+                        non_utf8_ratio=0.02, seed=0):
+    """在 root 下生成合成仓库，返回 {相对路径: 字节数}
+
+    同样的参数与 seed 总是生成同样的目录结构和文件内容。
+    """
+    rng = random.Random(seed)
+    dirs = _dir_paths(rng, depth, width)
+    manifest = {}
+    os.makedirs(root, exist_ok=True)
+    for d in dirs:
+        if d:
+            os.makedirs(os.path.join(root, d), exist_ok=True)
+
+    for i in range(files):
+        parent = rng.choice(dirs)
+        size = sample_size(rng, size_distribution, mean_size, max_size)
+        roll = rng.random()
+        if roll < binary_ratio:
+            ext, magic = rng.choice(BINARY_SAMPLES)
+            data = magic + bytes(rng.getrandbits(8) for _ in range(min(size, 4096)))
+        elif roll < binary_ratio + non_utf8_ratio:
+            ext = 'txt'
+            # GBK 编码的中文内容，utf-8 解码会失败
+            data = ('中文内容 ' * (size // 10 + 1))[:max(size // 2, 1)].encode('gbk')
+        else:
+            ext = rng.choice(TEXT_EXTENSIONS)
+            data = _text_body(rng, size).encode('utf-8')
+        name = f"f{i}" + (f".{ext}" if ext else '')
+        rel_path = f"{parent}/{name}" if parent else name
+        with open(os.path.join(root, rel_path), 'wb') as f:
+            f.write(data)
+        manifest[rel_path] = len(data)
+    return manifest
+
+
+def make_synthetic_paths(count, depth=6, width=8, seed=0):
+    """只生成路径列表（不落盘），用于目录树渲染等纯内存基准"""
+    rng = random.Random(seed)
+    dirs = _dir_paths(rng, depth, width)
+    return [f"{rng.choice(dirs)}/f{i}.py".lstrip('/') for i in range(count)]
@@ -2,29 +2,81 @@ import sys
 import os
 import re
 import math
+import json
+import time
+import fnmatch
+import argparse
+import hashlib
+import struct
+import io
+import ast
+import tokenize
+import subprocess
+import threading
+import queue
+import itertools
+import importlib
+from collections import OrderedDict, deque
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QTreeView, QTextEdit, QLabel, QMessageBox,
     QFileDialog, QListWidget, QListWidgetItem, QProgressDialog,
     QAbstractItemView, QSplitter, QLineEdit, QComboBox, QCheckBox
 )
-from PySide6.QtCore import Qt, QThread, Signal, QSortFilterProxyModel, QModelIndex, QFileSystemWatcher, QTimer
+from PySide6.QtCore import (
+    Qt, QThread, Signal, QSortFilterProxyModel, QModelIndex, QFileSystemWatcher, QTimer, QSettings, QStandardPaths,
+    QCoreApplication, QObject
+)
 from PySide6.QtGui import QStandardItemModel, QStandardItem, QClipboard, QFont, QPalette, QColor, QTextDocument
-from PySide6.QtPrintSupport import QPrinter
-
-# 尝试导入 markdown 库（用于 HTML 导出）
-try:
-    import markdown
-    MARKDOWN_AVAILABLE = True
-except ImportError:
-    MARKDOWN_AVAILABLE = False
-
-# 尝试导入 tiktoken
-try:
-    import tiktoken
-    TIKTOKEN_AVAILABLE = True
-except ImportError:
-    TIKTOKEN_AVAILABLE = False
+
+# ==================== 延迟导入 ====================
+# 可选依赖（markdown 用于 HTML 导出，tiktoken 用于精确 token 计数，zstandard 用于 .zst 输出）
+# 以及 QtPrintSupport 都在第一次用到时才导入，避免拖慢启动
+_optional_modules = {}
+
+def optional_import(name):
+    """导入可选模块，未安装时返回 None；结果会被缓存"""
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+def markdown_module():
+    return optional_import('markdown')
+
+def zstd_module():
+    return optional_import('zstandard')
+
+_tiktoken_encoding = None
+
+def tiktoken_encoding():
+    """cl100k_base 编码器，tiktoken 不可用时返回 None"""
+    global _tiktoken_encoding
+    if _tiktoken_encoding is None:
+        tiktoken = optional_import('tiktoken')
+        if tiktoken is None:
+            return None
+        try:
+            _tiktoken_encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _optional_modules['tiktoken'] = None
+            return None
+    return _tiktoken_encoding
+
+class LazyRegex:
+    """第一次使用时才编译的正则，接口与编译后的 re.Pattern 相同"""
+    __slots__ = ('_args', '_compiled')
+
+    def __init__(self, pattern, flags=0):
+        self._args = (pattern, flags)
+        self._compiled = None
+
+    def __getattr__(self, name):
+        if self._compiled is None:
+            self._compiled = re.compile(*self._args)
+        return getattr(self._compiled, name)
 
 # ==================== 常量定义 ====================
 BINARY_EXTENSIONS = {
@@ -39,6 +91,9 @@ BINARY_EXTENSIONS = {
     'bin', 'dat', 'db', 'sqlite', 'cur', 'icns'
 }
 
+# 生成时并行读取/处理文件的线程数
+DEFAULT_READ_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+
 SENSITIVE_KEYWORDS = [
     '.env', '.key', '.pem', 'id_rsa', 'id_dsa',
     'password', 'secret', 'token', 'credential', 'aws', 'private'
@@ -46,10 +101,10 @@ SENSITIVE_KEYWORDS = [
 
 # 敏感内容正则模式（用于替换）
 SENSITIVE_PATTERNS = [
-    (re.compile(r'(?i)(password|passwd|pwd)\s*[=:]\s*\S+'), r'\1 = [REDACTED]'),
-    (re.compile(r'(?i)(api[_-]?key|secret|token)\s*[=:]\s*\S+'), r'\1 = [REDACTED]'),
-    (re.compile(r'-----BEGIN (RSA|DSA|EC|OPENSSH) PRIVATE KEY-----.*?-----END \1 PRIVATE KEY-----', re.DOTALL), '[REDACTED PRIVATE KEY]'),
-    (re.compile(r'[A-Za-z0-9+/]{40,}={0,2}'), '[REDACTED BASE64]'),
+    (LazyRegex(r'(?i)(password|passwd|pwd)\s*[=:]\s*\S+'), r'\1 = [REDACTED]'),
+    (LazyRegex(r'(?i)(api[_-]?key|secret|token)\s*[=:]\s*\S+'), r'\1 = [REDACTED]'),
+    (LazyRegex(r'-----BEGIN (RSA|DSA|EC|OPENSSH) PRIVATE KEY-----.*?-----END \1 PRIVATE KEY-----', re.DOTALL), '[REDACTED PRIVATE KEY]'),
+    (LazyRegex(r'[A-Za-z0-9+/]{40,}={0,2}'), '[REDACTED BASE64]'),
 ]
 
 # 多语言字符串
@@ -60,7 +115,10 @@ STRINGS = {
         'no_folder': '未选择文件夹',
         'ext_filter': '🔍 扩展名筛选',
         'file_tree': '📂 项目文件 (勾选所需文件)',
-        'size_label': '📦 当前选中总大小: {}',
+        'size_label': '📦 当前选中: {} 个文件，{}，约 {} token',
+        'ext_stats': '{} 个文件 · {} · ~{} token',
+        'dir_stats': '{} 个文件 · {}',
+        'size_histogram': '文件大小分布',
         'generate': '生成 Markdown',
         'copy': '📋 复制到剪贴板',
         'export_md': '💾 导出为 .md',
@@ -84,6 +142,25 @@ STRINGS = {
         'binary_skipped': '[二进制文件，已跳过: {}]',
         'read_failed': '[读取失败: {}]',
         'auto_refresh': '🔄 自动刷新已启用',
+        'tree_more': '… 还有 {} 个文件',
+        'tree_annotation': '({} 个文件, {})',
+        'dedup': '♻️ 相同内容只输出一次',
+        'dedup_reference': '*(内容与 `{}` 完全相同，已省略)*',
+        'dedup_saved': '去重 {} 个文件，节省 {}（约 {} token）',
+        'git_index': '⚡ 使用 Git 索引扫描（仅已跟踪文件）',
+        'changed_since_placeholder': '仅包含相对某提交的改动，如 HEAD~1（留空为全部）',
+        'no_changed_files': '选中的文件中没有相对 {} 的改动',
+        'git_diff_failed': '无法获取相对 {} 的改动：\n{}',
+        'export_jsonl': '🧾 导出为 JSONL',
+        'exporting': '导出中...',
+        'export_failed': '导出失败：{}',
+        'secret_tooltip': '⚠️ 可能包含敏感信息：{}',
+        'secret_found': '发现 {} 个可能包含敏感信息的文件（橙色标出）',
+        'compact': '✂️ 压缩代码（去注释/空行）',
+        'compact_saved': '压缩节省约 {} token（最多: {} -{}）',
+        'outline': '📑 大文件只输出大纲',
+        'outline_note': '*(文件较大（{}），仅显示结构大纲)*',
+        'outline_saved': '{} 个大文件输出大纲，节省约 {} token',
     },
     'en': {
         'window_title': 'repo2md - Project to Markdown',
@@ -91,7 +168,10 @@ STRINGS = {
         'no_folder': 'No folder selected',
         'ext_filter': '🔍 Extension Filter',
         'file_tree': '📂 Project Files (check files)',
-        'size_label': '📦 Total size: {}',
+        'size_label': '📦 Selected: {} files, {}, ~{} tokens',
+        'ext_stats': '{} files · {} · ~{} tokens',
+        'dir_stats': '{} files · {}',
+        'size_histogram': 'Size distribution',
         'generate': 'Generate Markdown',
         'copy': '📋 Copy to Clipboard',
         'export_md': '💾 Export as .md',
@@ -115,6 +195,25 @@ STRINGS = {
         'binary_skipped': '[Binary file skipped: {}]',
         'read_failed': '[Read failed: {}]',
         'auto_refresh': '🔄 Auto-refresh enabled',
+        'tree_more': '… {} more files',
+        'tree_annotation': '({} files, {})',
+        'dedup': '♻️ Deduplicate identical files',
+        'dedup_reference': '*(identical to `{}`, omitted)*',
+        'dedup_saved': 'Deduplicated {} files, saved {} (~{} tokens)',
+        'git_index': '⚡ Scan from git index (tracked files only)',
+        'changed_since_placeholder': 'Only files changed since a ref, e.g. HEAD~1 (empty = all)',
+        'no_changed_files': 'None of the selected files changed since {}',
+        'git_diff_failed': 'Failed to diff against {}:\n{}',
+        'export_jsonl': '🧾 Export as JSONL',
+        'exporting': 'Exporting...',
+        'export_failed': 'Export failed: {}',
+        'secret_tooltip': '⚠️ May contain secrets: {}',
+        'secret_found': '{} files may contain secrets (shown in orange)',
+        'compact': '✂️ Compact code (strip comments/blank lines)',
+        'compact_saved': 'Compaction saved ~{} tokens (top: {} -{})',
+        'outline': '📑 Outline large files',
+        'outline_note': '*(Large file ({}), showing structural outline only)*',
+        'outline_saved': '{} large files outlined, saved ~{} tokens',
     }
 }
 
@@ -164,139 +263,1348 @@ def is_binary_file(file_path, check_magic=True):
 
     return False, ""
 
-def read_text_file(file_path):
-    encodings = ['utf-8', 'gbk', 'latin-1']
-    for enc in encodings:
+def decode_text_with_encoding(data):
+    """按 utf-8 / gbk / latin-1 依次尝试解码并统一换行符，返回 (文本, 编码)"""
+    for enc in ('utf-8', 'gbk', 'latin-1'):
         try:
-            with open(file_path, 'r', encoding=enc) as f:
-                return f.read()
+            text = data.decode(enc)
+            break
         except UnicodeDecodeError:
             continue
+    else:
+        enc = 'utf-8'
+        text = data.decode('utf-8', errors='ignore')
+    return text.replace('\r\n', '\n').replace('\r', '\n'), enc
+
+def decode_text(data):
+    return decode_text_with_encoding(data)[0]
+
+def read_text_file(file_path):
     with open(file_path, 'rb') as f:
-        data = f.read()
-        return data.decode('utf-8', errors='ignore')
+        return decode_text(f.read())
+
+def redact_with_count(text):
+    """替换文本中的敏感信息，返回 (文本, 替换次数)"""
+    total = 0
+    for pattern, replacement in SENSITIVE_PATTERNS:
+        text, n = pattern.subn(replacement, text)
+        total += n
+    return text, total
 
 def redact_sensitive_content(text):
     """替换文本中的敏感信息"""
-    for pattern, replacement in SENSITIVE_PATTERNS:
-        text = pattern.sub(replacement, text)
-    return text
+    return redact_with_count(text)[0]
 
 def estimate_tokens(text):
     """估算 token 数，优先使用 tiktoken"""
-    if TIKTOKEN_AVAILABLE:
+    enc = tiktoken_encoding()
+    if enc is not None:
         try:
-            enc = tiktoken.get_encoding("cl100k_base")
             return len(enc.encode(text))
         except:
             pass
     return len(text) // 4
 
+# ==================== 代码压缩 ====================
+# 每种语言一条正则：keep 分支匹配字符串字面量（含原始字符串、多行字符串、heredoc）并原样保留，
+# comment 分支匹配字符串之外的注释。正则无法可靠切分的语言（YAML 块标量、Perl、Haskell，
+# 以及文本中可含 // 的 JSX/TSX 和混合模板的 Vue 单文件组件）只压缩空白
+_STR_DQ = r'"(?:\\[\s\S]|[^"\\\n])*"'
+_STR_SQ = r"'(?:\\[\s\S]|[^'\\\n])*'"
+_STR_DQ_ML = r'"(?:\\[\s\S]|[^"\\])*"'          # 可以跨行的字符串（Rust、PHP、Shell、Ruby……）
+_STR_SQ_ML = r"'(?:\\[\s\S]|[^'\\])*'"
+_CHAR_SQ = r"'(?:\\.|[^'\\\n])'"                  # C/Java/Rust 等的字符字面量，避免把 Rust 生命周期当成字符串
+_STR_BT = r'`(?:\\[\s\S]|[^`\\])*`'              # JS 模板字符串
+_RAW_BT = r'`[^`]*`'                             # Go 原始字符串，没有转义
+_TRIPLE_DQ = r'"""(?:\\[\s\S]|[^\\])*?"""'       # Java 文本块、Swift/Dart 多行字符串（支持转义）
+_TRIPLE_SQ = r"'''(?:\\[\s\S]|[^\\])*?'''"
+_RAW_TRIPLE_DQ = r'"""[\s\S]*?"""'               # Kotlin/Scala/C# 原始字符串，没有转义
+_RAW_TRIPLE_SQ = r"'''[\s\S]*?'''"
+_SLASH_COMMENT = (r'//[^\n]*', r'/\*[\s\S]*?\*/')
+_HASH_COMMENT = (r'(?:(?<=\s)|^)#(?!!)[^\n]*',)
+_NEVER = r'(?!)'
+
+def _comment_regex(keep, comment):
+    return LazyRegex(rf'(?P<keep>{"|".join(keep) or _NEVER})|(?P<comment>{"|".join(comment)})', re.M)
+
+_C_RE = _comment_regex((_STR_DQ, _CHAR_SQ), _SLASH_COMMENT)
+_CPP_RE = _comment_regex((r'(?<![\w])(?:u8|[uUL])?R"(?P<delim>[^()\\\s"]{0,16})\([\s\S]*?\)(?P=delim)"',
+                          _STR_DQ, _CHAR_SQ), _SLASH_COMMENT)
+_JAVA_RE = _comment_regex((_TRIPLE_DQ, _STR_DQ, _CHAR_SQ), _SLASH_COMMENT)
+_CS_RE = _comment_regex((_RAW_TRIPLE_DQ, r'@"(?:[^"]|"")*"', _STR_DQ, _CHAR_SQ), _SLASH_COMMENT)
+_GO_RE = _comment_regex((_RAW_BT, _STR_DQ, _CHAR_SQ), _SLASH_COMMENT)
+_RUST_RE = _comment_regex((r'(?<![\w])b?r(?P<hashes>#*)"[\s\S]*?"(?P=hashes)', _STR_DQ_ML, _CHAR_SQ), _SLASH_COMMENT)
+_SWIFT_RE = _comment_regex((r'(?P<hashes>#+)"""[\s\S]*?"""(?P=hashes)', r'(?P<hash>#+)"[^\n]*?"(?P=hash)',
+                            _TRIPLE_DQ, _STR_DQ), _SLASH_COMMENT)
+_KOTLIN_RE = _comment_regex((_RAW_TRIPLE_DQ, _STR_DQ, _CHAR_SQ), _SLASH_COMMENT)
+_DART_RE = _comment_regex((r"(?<![\w$])r'''[\s\S]*?'''", r'(?<![\w$])r"""[\s\S]*?"""',
+                           r"(?<![\w$])r'[^'\n]*'", r'(?<![\w$])r"[^"\n]*"',
+                           _TRIPLE_SQ, _TRIPLE_DQ, _STR_DQ, _STR_SQ), _SLASH_COMMENT)
+_PROTO_RE = _comment_regex((_STR_DQ, _STR_SQ), _SLASH_COMMENT)
+_JS_RE = _comment_regex((_STR_DQ, _STR_SQ, _STR_BT), _SLASH_COMMENT)
+_GROOVY_RE = _comment_regex((_TRIPLE_DQ, _TRIPLE_SQ, _STR_DQ, _STR_SQ), _SLASH_COMMENT)
+_PHP_RE = _comment_regex((r'<<<[ \t]*(?P<quote>["\']?)(?P<tag>[A-Za-z_]\w*)(?P=quote)\n[\s\S]*?^[ \t]*(?P=tag)\b',
+                          _STR_DQ_ML, _STR_SQ_ML), _SLASH_COMMENT)
+_CSS_RE = _comment_regex((_STR_DQ, _STR_SQ), (r'/\*[\s\S]*?\*/',))
+# heredoc 正文原样保留：从起始行之后到只含结束标记的行
+_SHELL_RE = _comment_regex((r'(?<!<)<<-?[ \t]*(?P<quote>["\']?)(?P<tag>[A-Za-z_]\w*)(?P=quote)[^\n]*\n'
+                            r'[\s\S]*?^[ \t]*(?P=tag)[ \t]*$',
+                            _STR_DQ_ML, r"'[^']*'"), _HASH_COMMENT)
+_RUBY_RE = _comment_regex((r'(?<!<)<<[~-]?(?P<quote>["\'`]?)(?P<tag>[A-Za-z_]\w*)(?P=quote)[^\n]*\n'
+                           r'[\s\S]*?^[ \t]*(?P=tag)[ \t]*$',
+                           _STR_DQ_ML, _STR_SQ_ML), (r'^=begin\b[\s\S]*?^=end\b[^\n]*',) + _HASH_COMMENT)
+_R_RE = _comment_regex((r'(?<![\w.])[rR](?P<quote>["\'])(?P<dashes>-*)[(\[{][\s\S]*?[)\]}](?P=dashes)(?P=quote)',
+                        _STR_DQ_ML, _STR_SQ_ML), _HASH_COMMENT)
+_TOML_RE = _comment_regex((_TRIPLE_DQ, _RAW_TRIPLE_SQ, _STR_DQ, r"'[^'\n]*'"), _HASH_COMMENT)
+_MAKE_RE = _comment_regex((_STR_DQ, _STR_SQ), (r'(?:(?<=\s)|^)(?<!\\)#[^\n]*',))
+_CMAKE_RE = _comment_regex((r'(?<!#)\[(?P<eq>=*)\[[\s\S]*?\](?P=eq)\]', _STR_DQ_ML),
+                           (r'#\[(?P<ceq>=*)\[[\s\S]*?\](?P=ceq)\]', r'#[^\n]*'))
+_INI_RE = _comment_regex((), (r'^[ \t]*[#;][^\n]*',))     # 行内 # 不一定是注释（configparser 默认不支持），只删整行注释
+_CONF_RE = _comment_regex((), (r'^[ \t]*#[^\n]*',))
+_SQL_RE = _comment_regex((r"'(?:[^']|'')*'", r'"(?:[^"]|"")*"', r'`[^`]*`', r'\$(?P<tag>\w*)\$[\s\S]*?\$(?P=tag)\$'),
+                         (r'--[^\n]*', r'/\*[\s\S]*?\*/'))
+_LUA_RE = _comment_regex((r'\[(?P<eq>=*)\[[\s\S]*?\](?P=eq)\]', _STR_DQ, _STR_SQ),
+                         (r'--\[(?P<ceq>=*)\[[\s\S]*?\](?P=ceq)\]', r'--[^\n]*'))
+_XML_RE = _comment_regex((r'<!\[CDATA\[[\s\S]*?\]\]>',     # <script>/<style> 内容整体保留，其中字符串里的 <!-- 不是注释
+                          r'(?i:<script\b[\s\S]*?</script\s*>|<style\b[\s\S]*?</style\s*>)'),
+                         (r'<!--[\s\S]*?-->',))
+_BLANK_RUN_RE = LazyRegex(r'\n{3,}')
+
+_COMMENT_MARK = '\x00'     # 标记被删掉注释的位置，只剩注释的行随后整行删除
+
+def _strip_by_regex(pattern):
+    def strip(text):
+        def replace(m):
+            comment = m.group('comment')
+            if comment is None:
+                return m.group(0)
+            return _COMMENT_MARK + ('\n' + _COMMENT_MARK) * comment.count('\n')
+        return pattern.sub(replace, text)
+    return strip
+
+def _strip_python_comments(text):
+    lines = text.split('\n')
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(text).readline):
+            if tok.type == tokenize.COMMENT and not (tok.start[0] == 1 and tok.string.startswith('#!')):
+                row, col = tok.start
+                lines[row - 1] = lines[row - 1][:col] + _COMMENT_MARK
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return text     # 无法切分的源码只压缩空白
+    return '\n'.join(lines)
+
+def _compact_whitespace(text):
+    lines = []
+    for line in text.split('\n'):
+        if _COMMENT_MARK in line:
+            line = line.replace(_COMMENT_MARK, '')
+            if not line.strip():
+                continue
+        lines.append(line.rstrip())
+    return _BLANK_RUN_RE.sub('\n\n', '\n'.join(lines)).strip('\n')
+
+COMPACTORS = {}
+for _exts, _pattern in (
+    (('c', 'h'), _C_RE),
+    (('cpp', 'hpp', 'cc', 'cxx', 'hh', 'hxx'), _CPP_RE),
+    (('java',), _JAVA_RE),
+    (('cs',), _CS_RE),
+    (('go',), _GO_RE),
+    (('rs',), _RUST_RE),
+    (('swift',), _SWIFT_RE),
+    (('kt', 'kts', 'scala'), _KOTLIN_RE),
+    (('dart',), _DART_RE),
+    (('proto',), _PROTO_RE),
+    (('js', 'mjs', 'cjs', 'ts'), _JS_RE),
+    (('groovy',), _GROOVY_RE),
+    (('php',), _PHP_RE),
+    (('css', 'scss', 'less'), _CSS_RE),
+    (('sh', 'bash', 'zsh'), _SHELL_RE),
+    (('rb',), _RUBY_RE),
+    (('r',), _R_RE),
+    (('toml',), _TOML_RE),
+    (('mk',), _MAKE_RE),
+    (('cmake',), _CMAKE_RE),
+    (('ini', 'cfg'), _INI_RE),
+    (('conf',), _CONF_RE),
+    (('sql',), _SQL_RE),
+    (('lua',), _LUA_RE),
+    (('html', 'htm', 'xml', 'svg'), _XML_RE),
+):
+    for _ext in _exts:
+        COMPACTORS[_ext] = _strip_by_regex(_pattern)
+COMPACTORS.update(dict.fromkeys(('py', 'pyw', 'pyi'), _strip_python_comments))
+
+def compact_content(text, ext):
+    """按扩展名去掉注释（含许可证头）、行尾空白和多余空行；未知扩展名只压缩空白"""
+    strip = COMPACTORS.get(ext)
+    if strip is not None:
+        text = strip(text)
+    return _compact_whitespace(text)
+
+# ==================== 结构大纲 ====================
+OUTLINE_DEFAULT_THRESHOLD = 32 * 1024
+OUTLINE_MAX_LINE = 200
+OUTLINE_HEAD_LINES = 40
+
+_DECL_MODIFIERS = (r'(?:(?:export|default|public|private|protected|internal|static|abstract|final|async|virtual|'
+                   r'override|inline|extern|unsafe|pub(?:\([^)]*\))?|open|sealed|data|declare)\s+)*')
+_NOT_KEYWORD = r'(?!(?:if|for|while|switch|catch|return|else|do|try|new|sizeof)\b)'
+
+OUTLINE_PATTERNS = {}
+for _exts, _patterns in (
+    (('c', 'h', 'cpp', 'hpp', 'cc', 'cxx', 'java', 'cs', 'go', 'rs', 'swift', 'kt', 'kts', 'scala', 'dart',
+      'js', 'jsx', 'mjs', 'cjs', 'ts', 'tsx', 'php', 'groovy', 'proto'), [
+        _DECL_MODIFIERS + r'(?:class|interface|struct|enum|trait|impl|fn|func|function|type|module|namespace|'
+                          r'object|record|union|typedef|message|service)\b',
+        r'^' + _NOT_KEYWORD + r'[A-Za-z_][\w\s\*&:<>,\[\]]*\b\w+\s*\([^;{]*\)\s*(?:const\s*)?\{?\s*$',
+        r'^\s*(?:public|private|protected|internal)\s+[\w<>\[\],\s\?]*\(',
+        r'^\s*(?:export\s+)?(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?(?:\([^)]*\)|\w+)\s*=>',
+        r'^\s+(?:async\s+|static\s+|get\s+|set\s+)*' + _NOT_KEYWORD + r'\w+\s*\([^)]*\)\s*\{\s*$',
+    ]),
+    (('py', 'pyw', 'pyi', 'rb'), [r'^\s*(?:async\s+)?(?:def|class|module)\b']),
+    (('sh', 'bash', 'zsh'), [r'^\s*(?:function\s+)?[\w-]+\s*\(\)\s*\{?', r'^\s*function\s+[\w-]+']),
+    (('md', 'markdown', 'rst'), [r'^#{1,6}\s']),
+    (('yaml', 'yml'), [r'^[\w"\'-][^:#]*:']),
+    (('toml', 'ini', 'cfg'), [r'^\s*\[']),
+    (('sql',), [r'^\s*(?i:create)\s+']),
+    (('lua',), [r'^\s*(?:local\s+)?function\b']),
+):
+    _regex = LazyRegex('|'.join(f'(?:{p})' for p in _patterns), re.M)
+    for _ext in _exts:
+        OUTLINE_PATTERNS[_ext] = _regex
+
+def _python_outline(text):
+    """用 ast 提取 import、顶层赋值、类与函数签名及 docstring，函数体替换为 ..."""
+    tree = ast.parse(text)
+    lines = text.split('\n')
+    out = []
+
+    def segment(start, end):
+        return [line.rstrip()[:OUTLINE_MAX_LINE] for line in lines[start - 1:end]]
+
+    def docstring_node(node):
+        body = getattr(node, 'body', None)
+        if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], 'value', None), ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            return body[0]
+        return None
+
+    def visit(body, indent):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+                first_body = node.body[0].lineno
+                # 函数体与签名写在同一行（def f(): pass）：在函数体起点截断签名行，docstring 与函数体都省略
+                header = lines[first_body - 1].encode('utf-8')[:node.body[0].col_offset].decode('utf-8', errors='replace')
+                if header.strip():
+                    out.extend(segment(start, first_body - 1))
+                    out.append((header.rstrip() + ' ...')[:OUTLINE_MAX_LINE])
+                    continue
+                out.extend(segment(start, max(first_body - 1, node.lineno)))
+                doc = docstring_node(node)
+                if doc is not None:
+                    out.extend(segment(doc.lineno, doc.end_lineno))
+                if isinstance(node, ast.ClassDef):
+                    inner = [n for n in node.body if n is not doc]
+                    before = len(out)
+                    visit(inner, indent + '    ')
+                    if len(out) == before:
+                        out.append(indent + '    ...')
+                else:
+                    out.append(indent + '    ...')
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                out.extend(segment(node.lineno, node.end_lineno))
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and node.lineno == node.end_lineno:
+                out.extend(segment(node.lineno, node.lineno))
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                out.append(segment(node.lineno, node.lineno)[0] + ' ...')
+
+    doc = docstring_node(tree)
+    if doc is not None:
+        out.extend(segment(doc.lineno, doc.end_lineno))
+    visit([n for n in tree.body if n is not doc], '')
+    return '\n'.join(out)
+
+def build_outline(text, ext):
+    """提取文件结构大纲：Python 用 ast，其他语言用正则匹配声明行；都不适用时保留开头若干行"""
+    if ext in ('py', 'pyw', 'pyi'):
+        try:
+            return _python_outline(text)
+        except (SyntaxError, ValueError, RecursionError):
+            pass
+    pattern = OUTLINE_PATTERNS.get(ext)
+    if pattern is not None:
+        found = [m.group(0) for m in re.finditer(r'^.*$', text, re.M) if pattern.match(m.group(0))]
+        if found:
+            return '\n'.join(line.rstrip()[:OUTLINE_MAX_LINE] for line in found)
+    head = text.split('\n', OUTLINE_HEAD_LINES)
+    if len(head) > OUTLINE_HEAD_LINES:
+        head[-1] = '…'
+    return '\n'.join(head)
+
+# ==================== 目录树渲染 ====================
+def _tree_node():
+    # [子节点 {名称: 子目录节点 或 None(文件)}, 文件数, 总字节数]
+    return [{}, 0, 0]
+
+def render_tree(paths, root_name, sizes=None, max_depth=None, max_width=None, annotate=False,
+                more_fmt='… 还有 {} 个文件', annotation_fmt='({} 个文件, {})'):
+    """迭代渲染 ASCII 目录树（不递归、不做字符串累加）
+
+    sizes: {相对路径: 字节数}，用于目录标注
+    max_depth: 超过该深度的目录只显示目录名，其内容折叠为一行
+    max_width: 每个目录最多显示的条目数，其余折叠为一行
+    annotate: 在目录名后标注文件数和总大小
+    """
+    # 先按所在目录分组，每个目录只建一次节点，避免逐个路径逐级查找
+    by_dir = {}
+    for p in paths:
+        d, _, name = p.rpartition('/')
+        names = by_dir.get(d)
+        if names is None:
+            names = by_dir[d] = []
+        names.append(name)
+
+    root = _tree_node()
+    nodes = {'': root}
+    for d, names in by_dir.items():
+        node = nodes.get(d)
+        if node is None:
+            chain = []
+            key = d
+            while key not in nodes:
+                chain.append(key)
+                key = key.rpartition('/')[0]
+            node = nodes[key]
+            for key in reversed(chain):
+                child = _tree_node()
+                node[0][key.rpartition('/')[2]] = child
+                nodes[key] = child
+                node = child
+        children = node[0]
+        for name in names:
+            children.setdefault(name, None)
+        node[1] += len(names)
+        if sizes:
+            prefix = d + '/' if d else ''
+            node[2] += sum(sizes.get(prefix + name, 0) for name in names)
+
+    # 自底向上累加子目录的文件数与大小
+    for key in sorted(nodes, key=lambda k: k.count('/'), reverse=True):
+        if key:
+            node = nodes[key]
+            parent = nodes[key.rpartition('/')[0]]
+            parent[1] += node[1]
+            parent[2] += node[2]
+
+    def _label(name, node):
+        if annotate:
+            return f"{name}/ " + annotation_fmt.format(node[1], format_bytes(node[2]))
+        return name + '/'
+
+    def _entries(node, prefix, depth):
+        items = sorted(node[0].items(), key=lambda x: (x[1] is None, x[0].lower()))
+        hidden = 0
+        if max_width is not None and len(items) > max_width:
+            for _, child in items[max_width:]:
+                hidden += 1 if child is None else child[1]
+            items = items[:max_width]
+        return [items, 0, prefix, depth, hidden]
+
+    out = [_label(root_name, root)]
+    stack = [_entries(root, '', 1)]
+    while stack:
+        frame = stack[-1]
+        items, i, prefix, depth, hidden = frame
+        if i >= len(items):
+            if hidden:
+                out.append(prefix + '└── ' + more_fmt.format(hidden))
+            stack.pop()
+            continue
+        frame[1] = i + 1
+        name, child = items[i]
+        last = i == len(items) - 1 and not hidden
+        branch = '└── ' if last else '├── '
+        if child is None:
+            out.append(prefix + branch + name)
+            continue
+        out.append(prefix + branch + _label(name, child))
+        child_prefix = prefix + ('    ' if last else '│   ')
+        if max_depth is not None and depth >= max_depth:
+            out.append(child_prefix + '└── ' + more_fmt.format(child[1]))
+            continue
+        stack.append(_entries(child, child_prefix, depth + 1))
+
+    out.append('')
+    return '\n'.join(out)
+
+# ==================== 扫描 ====================
+def _sorted_extensions(extensions):
+    return sorted(extensions, key=lambda x: (x == '[无后缀]', x))
+
+def scan_directory(root_path):
+    """遍历文件系统，返回 ({rel: (abs, size, mtime_ns)}, 扩展名列表)"""
+    file_map = {}
+    extensions = set()
+    for root, dirs, files in os.walk(root_path):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for file in files:
+            if file.startswith('.'):
+                continue
+            abs_path = os.path.join(root, file)
+            rel_path = os.path.relpath(abs_path, root_path).replace('\\', '/')
+            try:
+                st = os.stat(abs_path)
+            except OSError:
+                continue
+            file_map[rel_path] = (abs_path, st.st_size, st.st_mtime_ns)
+            extensions.add(get_extension(rel_path))
+    return file_map, _sorted_extensions(extensions)
+
+def find_git_dir(path):
+    """向上查找 git 仓库，返回 (工作区根目录, .git 目录)；找不到返回 (None, None)"""
+    path = os.path.abspath(path)
+    while True:
+        dot_git = os.path.join(path, '.git')
+        if os.path.isdir(dot_git):
+            return path, dot_git
+        if os.path.isfile(dot_git):
+            # worktree / submodule：.git 是一个写有 "gitdir: <路径>" 的文件
+            with open(dot_git, 'r', encoding='utf-8') as f:
+                line = f.readline().strip()
+            if line.startswith('gitdir:'):
+                git_dir = line[len('gitdir:'):].strip()
+                return path, os.path.normpath(os.path.join(path, git_dir))
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None, None
+        path = parent
+
+def read_git_index(git_dir):
+    """解析 .git/index（v2/v3/v4），返回 [(path, size, mtime_ns, mode)]
+
+    只读本地文件，不调用 git 命令；冲突条目只保留一次，子模块和稀疏目录条目被跳过。
+    """
+    with open(os.path.join(git_dir, 'index'), 'rb') as f:
+        data = f.read()
+    if data[:4] != b'DIRC':
+        raise ValueError("不是有效的 git index 文件")
+    version, count = struct.unpack('>II', data[4:12])
+    if version not in (2, 3, 4):
+        raise ValueError(f"不支持的 git index 版本: {version}")
+
+    entries = []
+    seen = set()
+    pos = 12
+    prev_path = b''
+    for _ in range(count):
+        start = pos
+        (mtime_s, mtime_ns, mode, size) = struct.unpack('>II8xI8xI', data[pos + 8:pos + 40])
+        flags, = struct.unpack('>H', data[pos + 60:pos + 62])
+        pos += 62
+        if version >= 3 and flags & 0x4000:
+            pos += 2    # 扩展标志
+        if version == 4:
+            # 前缀压缩：先读出要从上一个路径末尾删掉的字节数
+            c = data[pos]
+            pos += 1
+            strip = c & 0x7f
+            while c & 0x80:
+                c = data[pos]
+                pos += 1
+                strip = ((strip + 1) << 7) | (c & 0x7f)
+            end = data.index(b'\0', pos)
+            path = prev_path[:len(prev_path) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b'\0', pos)
+            path = data[pos:end]
+            # 条目按 8 字节对齐，且至少有一个 NUL
+            pos = start + ((end - start + 8) & ~7)
+        prev_path = path
+
+        obj_type = mode >> 12
+        if obj_type not in (0o10, 0o12):     # 只要普通文件和符号链接
+            continue
+        if path in seen:
+            continue
+        seen.add(path)
+        entries.append((path.decode('utf-8', errors='surrogateescape'), size,
+                        mtime_s * 1_000_000_000 + mtime_ns, mode))
+    return entries
+
+def scan_git_index(root_path):
+    """从 git index 读取被跟踪的文件，返回值与 scan_directory 相同
+
+    大小和修改时间取自 index（即上次 git 刷新时的状态），不逐个 stat 文件。
+    root_path 不是 git 仓库时返回 None。
+    """
+    work_tree, git_dir = find_git_dir(root_path)
+    if git_dir is None or not os.path.isfile(os.path.join(git_dir, 'index')):
+        return None
+    prefix = os.path.relpath(os.path.abspath(root_path), work_tree).replace('\\', '/')
+    prefix = '' if prefix == '.' else prefix + '/'
+
+    file_map = {}
+    extensions = set()
+    for path, size, mtime_ns, _ in read_git_index(git_dir):
+        if not path.startswith(prefix):
+            continue
+        rel_path = path[len(prefix):]
+        # 与文件系统扫描保持一致：跳过隐藏文件和隐藏目录
+        if rel_path.startswith('.') or '/.' in rel_path:
+            continue
+        file_map[rel_path] = (os.path.join(root_path, *rel_path.split('/')), size, mtime_ns)
+        extensions.add(get_extension(rel_path))
+    return file_map, _sorted_extensions(extensions)
+
+def git_changed_files(root_path, ref):
+    """返回相对 ref 有改动的文件（相对 root_path 的路径集合），调用本地 git 命令
+
+    ref 先用 rev-parse 解析为提交，以 "-" 开头或无法解析时抛出 RuntimeError，不会被当作 git 选项。
+    """
+    if not ref or ref.startswith('-'):
+        raise RuntimeError(f"无效的 git 引用：{ref!r}")
+    proc = subprocess.run(
+        ['git', '-C', root_path, 'rev-parse', '--verify', '--quiet', '--end-of-options', ref + '^{commit}'],
+        capture_output=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"无法解析为提交：{ref}")
+    commit = proc.stdout.decode('ascii').strip()
+    proc = subprocess.run(
+        ['git', '-C', root_path, 'diff', '--name-only', '--relative', '-z', '--end-of-options', commit, '--'],
+        capture_output=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode('utf-8', errors='replace').strip() or f"git diff {ref} 失败")
+    return {p.decode('utf-8', errors='surrogateescape') for p in proc.stdout.split(b'\0') if p}
+
+def select_changed_since(root_path, paths, ref):
+    """只保留相对 ref 有改动的路径（保持原有顺序）"""
+    changed = git_changed_files(root_path, ref)
+    return [p for p in paths if p in changed]
+
+# ==================== 扫描统计 ====================
+# 文件大小直方图的分桶上界（字节），最后一桶为 >= 最后一个上界
+SIZE_HISTOGRAM_BOUNDS = (1024, 16 * 1024, 256 * 1024, 1024 * 1024)
+
+def _new_aggregate():
+    return {'files': 0, 'bytes': 0, 'tokens': 0}
+
+def aggregate_file_map(file_map):
+    """按扩展名和目录汇总文件数、字节数与估算 token 数（按字节数 / 4 估算，不读取文件内容）
+
+    返回 {'extensions': {ext: {...,'histogram': [各桶文件数]}}, 'dirs': {dir: {...}}}；
+    目录统计包含所有子目录，根目录为 ''。
+    """
+    by_ext = {}
+    direct = {}     # 只含直接子文件的目录统计
+    for rel_path, (_, size, _) in file_map.items():
+        tokens = size // 4
+        ext = get_extension(rel_path)
+        agg = by_ext.get(ext)
+        if agg is None:
+            agg = by_ext[ext] = dict(_new_aggregate(), histogram=[0] * (len(SIZE_HISTOGRAM_BOUNDS) + 1))
+        agg['files'] += 1
+        agg['bytes'] += size
+        agg['tokens'] += tokens
+        bucket = 0
+        while bucket < len(SIZE_HISTOGRAM_BOUNDS) and size >= SIZE_HISTOGRAM_BOUNDS[bucket]:
+            bucket += 1
+        agg['histogram'][bucket] += 1
+
+        dir_path = rel_path.rpartition('/')[0]
+        agg = direct.get(dir_path)
+        if agg is None:
+            agg = direct[dir_path] = _new_aggregate()
+        agg['files'] += 1
+        agg['bytes'] += size
+        agg['tokens'] += tokens
+
+    # 自底向上累加到所有上级目录
+    by_dir = {}
+    for dir_path, agg in direct.items():
+        while True:
+            total = by_dir.get(dir_path)
+            if total is None:
+                total = by_dir[dir_path] = _new_aggregate()
+            total['files'] += agg['files']
+            total['bytes'] += agg['bytes']
+            total['tokens'] += agg['tokens']
+            if not dir_path:
+                break
+            dir_path = dir_path.rpartition('/')[0]
+    return {'extensions': by_ext, 'dirs': by_dir}
+
+def size_histogram_labels():
+    """直方图各桶的标签，如 '<1.0 KB'、'1.0 KB–16.0 KB'、'>=1.0 MB'"""
+    bounds = [format_bytes(b) for b in SIZE_HISTOGRAM_BOUNDS]
+    return ([f"<{bounds[0]}"] + [f"{lo}–{hi}" for lo, hi in zip(bounds, bounds[1:])] + [f">={bounds[-1]}"])
+
+# ==================== 项目会话 ====================
+SESSION_VERSION = 1
+
+def session_file(session_dir, root_path):
+    """每个项目一个会话文件，文件名取规范化根路径的哈希"""
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(root_path)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(session_dir, key + '.json')
+
+def snapshot_from_file_map(file_map):
+    """扫描结果的可序列化快照：{rel: [size, mtime_ns]}"""
+    return {rel: [size, mtime] for rel, (_, size, mtime) in file_map.items()}
+
+def file_map_from_snapshot(root_path, snapshot):
+    return {rel: (os.path.join(root_path, *rel.split('/')), size, mtime) for rel, (size, mtime) in snapshot.items()}
+
+def diff_file_maps(old, new):
+    """比较两次扫描结果，返回 (新增, 删除, 变化) 的相对路径列表；大小或修改时间不同即视为变化"""
+    added = [rel for rel in new if rel not in old]
+    removed = [rel for rel in old if rel not in new]
+    changed = [rel for rel, value in new.items() if rel in old and old[rel][1:] != value[1:]]
+    return added, removed, changed
+
+def load_session(path):
+    """读取会话文件，不存在、损坏或版本不符时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(session, dict) or session.get('version') != SESSION_VERSION:
+        return None
+    return session
+
+def save_session(path, session):
+    """先写临时文件再替换，避免中途退出留下半个文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(session, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
 # ==================== 扫描线程 ====================
 class ScanThread(QThread):
-    finished_scan = Signal(dict, list)  # {rel: (abs,size)}, extensions list
+    finished_scan = Signal(dict, list, dict)  # {rel: (abs, size, mtime_ns)}, extensions list, aggregate_file_map()
 
-    def __init__(self, root_path):
+    def __init__(self, root_path, source='fs'):
         super().__init__()
         self.root_path = root_path
+        self.source = source    # 'fs' 遍历文件系统，'git' 读取 git index
 
     def run(self):
-        file_map = {}
-        extensions = set()
-        for root, dirs, files in os.walk(self.root_path):
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            for file in files:
-                if file.startswith('.'):
-                    continue
-                abs_path = os.path.join(root, file)
-                rel_path = os.path.relpath(abs_path, self.root_path).replace('\\', '/')
-                size = os.path.getsize(abs_path)
-                file_map[rel_path] = (abs_path, size)
-                ext = get_extension(rel_path)
-                extensions.add(ext)
+        result = None
+        if self.source == 'git':
+            try:
+                result = scan_git_index(self.root_path)
+            except (OSError, ValueError, struct.error):
+                result = None
+        if result is None:
+            result = scan_directory(self.root_path)
+        file_map, extensions = result
+        self.finished_scan.emit(file_map, extensions, aggregate_file_map(file_map))
+
+# ==================== 内容缓存 ====================
+class ContentCache:
+    """按 (mtime, size) 缓存文件的解码内容与哈希，文件变化后自动失效
+
+    多个生成任务（包括后台线程）共享同一个实例，超过 max_bytes 时按 LRU 淘汰。
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # abs_path -> {'key': (mtime, size), 'digest', 'text', ...}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, abs_path, mtime, size):
+        with self._lock:
+            entry = self._entries.get(abs_path)
+            if entry is None or entry['key'] != (mtime, size):
+                return None
+            self._entries.move_to_end(abs_path)
+            return entry
+
+    def put(self, abs_path, mtime, size, **fields):
+        with self._lock:
+            entry = self._entries.get(abs_path)
+            if entry is None or entry['key'] != (mtime, size):
+                if entry is not None:
+                    self._bytes -= entry.get('cost', 0)
+                entry = {'key': (mtime, size)}
+                self._entries[abs_path] = entry
+            self._entries.move_to_end(abs_path)
+            entry.update(fields)
+            cost = len(entry.get('text') or '')
+            self._bytes += cost - entry.get('cost', 0)
+            entry['cost'] = cost
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.get('cost', 0)
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+def iter_ordered(func, items, workers=1):
+    """用线程池并行执行 func(item)，按输入顺序产出结果；预取量有上限，workers<=1 时顺序执行"""
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    from concurrent.futures import ThreadPoolExecutor
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='repo2md-read')
+    pending = deque()
+    items = iter(items)
+    try:
+        for item in itertools.islice(items, workers * 4):
+            pending.append(pool.submit(func, item))
+        while pending:
+            result = pending.popleft().result()
+            for item in itertools.islice(items, 1):
+                pending.append(pool.submit(func, item))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+# 按大小调度：小文件相邻合并成一个任务，每个文件另计固定开销（打开、stat、解码）
+SCHEDULE_BATCH_BYTES = 256 * 1024
+SCHEDULE_BATCH_MAX_FILES = 64
+SCHEDULE_FILE_OVERHEAD = 4 * 1024
+# 每个线程至少分到这么多个任务：批次上限再取 总权重 / (workers × 该值)，小仓库也能把线程用满
+SCHEDULE_TASKS_PER_WORKER = 16
+# 同时在途（已提交或已完成但未产出）的数据量上限，保证流式输出时内存有界
+SCHEDULE_WINDOW_BYTES = 128 * 1024 * 1024
+
+def plan_tasks(sizes, workers=1, batch_bytes=SCHEDULE_BATCH_BYTES, batch_max_files=SCHEDULE_BATCH_MAX_FILES,
+               overhead=SCHEDULE_FILE_OVERHEAD):
+    """把下标 0..n-1 划分为任务并按预计耗时从大到小排序（LPT），返回 [(权重, [下标...])]
+
+    第一个文件总是单独成为一个任务，输出不必等一整批；大文件单独成为一个任务；
+    其余小文件按输入顺序相邻合并，直到累计权重或文件数达到上限。权重上限不超过总权重 / (workers × 16)，
+    文件少时批次也小，不会只剩几个大批次让线程空等。
+    """
+    weights = [size + overhead for size in sizes]
+    cap = min(batch_bytes, max(overhead, sum(weights) // (max(1, workers) * SCHEDULE_TASKS_PER_WORKER)))
+    tasks = []
+    batch, batch_weight = [], 0
+    for i, (size, weight) in enumerate(zip(sizes, weights)):
+        if i == 0 or size >= cap:
+            tasks.append((weight, [i]))
+            continue
+        batch.append(i)
+        batch_weight += weight
+        if batch_weight >= cap or len(batch) >= batch_max_files:
+            tasks.append((batch_weight, batch))
+            batch, batch_weight = [], 0
+    if batch:
+        tasks.append((batch_weight, batch))
+    tasks.sort(key=lambda task: -task[0])   # 稳定排序：同样大小保持输入顺序
+    return tasks
+
+def _schedule_windows(sizes, window_bytes):
+    """按输入顺序把下标切成累计字节数不超过 window_bytes 的窗口（单个超大文件独占一个窗口）"""
+    start, total = 0, 0
+    for i, size in enumerate(sizes):
+        if i > start and total + size > window_bytes:
+            yield start, i
+            start, total = i, 0
+        total += size
+    if start < len(sizes):
+        yield start, len(sizes)
+
+def iter_scheduled(func, items, sizes, workers=1, window_bytes=SCHEDULE_WINDOW_BYTES, **plan_options):
+    """用线程池并行执行 func(item)，大文件先处理（LPT）、小文件成批处理，仍按输入顺序产出结果
+
+    每个窗口的前 workers+1 个文件先逐个提交，不必等规划；其余部分在产出结果的间隙规划，每产出一个结果
+    再提交 workers 个任务（需要的结果还没提交时立即补齐），避免一次提交几百个任务时读取线程抢不到 GIL。
+    只有在途窗口的 future 被引用，结果产出后即释放，在途数据最多约两个窗口。workers<=1 时顺序执行。
+    """
+    items = list(items)
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    def run(indices):
+        return [func(items[i]) for i in indices]
+
+    from concurrent.futures import ThreadPoolExecutor
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='repo2md-read')
+    windows = _schedule_windows(sizes, window_bytes)
+    submitted = deque()     # 在途窗口 [(start, end, {下标: (future, 任务内位置)})]
+    backlog = deque()       # 尚未提交的部分 [(slots, start, end, 任务迭代器或 None)]，迭代器在首次提交时才规划
+
+    def submit(indices, slots):
+        future = pool.submit(run, indices)
+        for position, i in enumerate(indices):
+            slots[i] = (future, position)
+
+    def submit_next_window():
+        for start, end in itertools.islice(windows, 1):
+            slots = {}
+            head_end = min(end, start + workers + 1)
+            for i in range(start, head_end):
+                submit([i], slots)
+            if head_end < end:
+                backlog.append([slots, head_end, end, None])
+            submitted.append((start, end, slots))
+
+    def submit_backlog(limit=None):
+        while backlog and limit != 0:
+            part = backlog[0]
+            slots, start, end, tasks = part
+            if tasks is None:
+                tasks = part[3] = iter(plan_tasks(sizes[start:end], workers, **plan_options))
+            for _, indices in itertools.islice(tasks, limit):
+                submit([start + i for i in indices], slots)
+                if limit is not None:
+                    limit -= 1
+            if limit != 0:
+                backlog.popleft()   # 该部分已全部提交
 
-        extensions = sorted(extensions, key=lambda x: (x == '[无后缀]', x))
-        self.finished_scan.emit(file_map, extensions)
+    try:
+        submit_next_window()
+        while submitted:
+            start, end, slots = submitted[0]
+            for i in range(start, end):
+                while i not in slots:
+                    submit_backlog(workers)
+                future, position = slots.pop(i)
+                results = future.result()
+                # 同一任务的结果列表要等整批产出完才释放，已产出的先置空
+                result, results[position] = results[position], None
+                yield result
+                submit_backlog(workers)
+                if len(submitted) < 2:
+                    submit_next_window()
+            submitted.popleft()
+    finally:
+        for _, _, slots in submitted:
+            for future, _ in slots.values():
+                future.cancel()
+        pool.shutdown(wait=False)
+
+def load_file(abs_path, content_cache=None):
+    """读取文本文件，返回 (digest, 文本, 编码, 二进制原因, 缓存键)，优先使用内容缓存
+
+    缓存键是读取前取得的 (mtime_ns, size)，派生数据（大纲等）应以同一个键写回缓存。
+    """
+    is_bin, reason = is_binary_file(abs_path, check_magic=False)
+    if is_bin:
+        return None, None, None, reason, None
+    st = os.stat(abs_path)
+    key = (st.st_mtime_ns, st.st_size)
+    if content_cache is not None:
+        entry = content_cache.get(abs_path, *key)
+        if entry is not None and 'text' in entry:
+            return entry['digest'], entry['text'], entry['encoding'], '', key
+    is_bin, reason = is_binary_file(abs_path)
+    if is_bin:
+        return None, None, None, reason, None
+    with open(abs_path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    text, encoding = decode_text_with_encoding(data)
+    if content_cache is not None:
+        content_cache.put(abs_path, *key, digest=digest, text=text, encoding=encoding)
+    return digest, text, encoding, '', key
+
+def load_outline(abs_path, text, ext, content_cache=None, key=None):
+    """生成文件结构大纲；key 为 load_file 读取 text 时的 (mtime, size)，同一键的大纲直接复用
+
+    不重新 stat：文件在两次调用之间变化时，旧文本的大纲不能记到新的键下。
+    """
+    if content_cache is None or key is None:
+        return build_outline(text, ext)
+    entry = content_cache.get(abs_path, *key)
+    if entry is not None and 'outline' in entry:
+        return entry['outline']
+    outline = build_outline(text, ext)
+    content_cache.put(abs_path, *key, outline=outline)
+    return outline
+
+# ==================== 敏感信息检测 ====================
+# 检测与替换用不同的规则：替换宁多勿少，检测要避免普通代码触发警告（tiktoken==0.5、password = getpass() 等）。
+# 只认 "键 = 值" 形式的赋值，键名须独立成词（允许 db_password、GITHUB_TOKEN 这类前后缀），值再按规则做合理性检查
+_SECRET_ASSIGNMENT = (
+    r'(?<![A-Za-z0-9])(?:[A-Za-z0-9]+[_.-])*(?:{keys})(?:[_-][A-Za-z0-9]+)*["\']?[ \t]*(?::=|=>|=(?!=)|:(?!:))[ \t]*'
+    r'(?:(["\'`])([^"\'`\s\x00-\x1f]+)\1|([^\s"\'`,;)\]}}\x00-\x1f]+))'
+)
+SECRET_PATTERNS = (
+    ('password', LazyRegex(_SECRET_ASSIGNMENT.format(keys=r'password|passwd|pwd'), re.IGNORECASE)),
+    ('api_key', LazyRegex(_SECRET_ASSIGNMENT.format(keys=r'api[_-]?key|access[_-]?key|secret|token'), re.IGNORECASE)),
+    ('private_key', LazyRegex(r'-----BEGIN (?:[A-Z]+ )?PRIVATE KEY-----\r?\n(?:[\w-]+:.*\r?\n|\s*\r?\n)*[A-Za-z0-9+/=]{40,}')),
+)
+# 占位符、模板变量、掩码
+_SECRET_PLACEHOLDER = LazyRegex(r'[${}<>%*]|^(?:x+|\.+|none|null|true|false|changeme|example\w*|your\w*)$', re.IGNORECASE)
+# 未加引号的值若是标识符、属性访问或调用（os.environ["X"]、get_token()），说明是代码而不是字面量
+_SECRET_CODE_VALUE = LazyRegex(r'[A-Za-z_][\w]*(?:\.[A-Za-z_]\w*)*|.*[(\[].*')
+SECRET_MIN_PASSWORD = 6
+SECRET_MIN_TOKEN = 16
+SECRET_MIN_ENTROPY = 3.0
+SECRET_SCAN_MAX_BYTES = 2 * 1024 * 1024
+
+def _shannon_entropy(value):
+    counts = {}
+    for ch in value:
+        counts[ch] = counts.get(ch, 0) + 1
+    return -sum(n / len(value) * math.log2(n / len(value)) for n in counts.values())
+
+def _plausible_secret(name, value, quoted):
+    """值是否像真实的密码/密钥：排除占位符、纯单词、代码表达式和低熵字符串"""
+    if _SECRET_PLACEHOLDER.search(value):
+        return False
+    if not quoted and name == 'password' and _SECRET_CODE_VALUE.fullmatch(value):
+        return False
+    if name == 'password':
+        return len(value) >= SECRET_MIN_PASSWORD and re.search(r'[^A-Za-z]', value) is not None
+    # 令牌：足够长、同时含字母和数字、字符分布足够随机
+    if len(value) < SECRET_MIN_TOKEN or not re.search(r'\d', value) or not re.search(r'[A-Za-z]', value):
+        return False
+    if not quoted and ('(' in value or '[' in value or re.fullmatch(r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+', value)):
+        return False
+    return _shannon_entropy(value) >= SECRET_MIN_ENTROPY
+
+def find_secrets(text):
+    """返回文本中命中的敏感规则名列表"""
+    found = []
+    for name, pattern in SECRET_PATTERNS:
+        if name == 'private_key':
+            if pattern.search(text):
+                found.append(name)
+            continue
+        for match in pattern.finditer(text):
+            quoted = match.group(2) is not None
+            if _plausible_secret(name, match.group(2) if quoted else match.group(3), quoted):
+                found.append(name)
+                break
+    return found
+
+def sensitive_name_hit(rel_path):
+    lower = rel_path.lower()
+    return any(k in lower for k in SENSITIVE_KEYWORDS)
+
+def detect_secrets(abs_path, size, content_cache=None):
+    """检查文件内容，返回命中的敏感规则名列表"""
+    if size > SECRET_SCAN_MAX_BYTES:
+        return []
+    try:
+        _, text, _, binary_reason, _ = load_file(abs_path, content_cache)
+    except Exception:
+        return []
+    if binary_reason:
+        return []
+    return find_secrets(text)
 
-# ==================== 生成 Markdown 线程 ====================
-class GenerateThread(QThread):
-    progress = Signal(str)      # 当前处理的文件
-    result = Signal(str)        # 最终markdown内容
+class SecretScanThread(QThread):
+    """扫描完成后在后台检测敏感内容，按 (mtime, size) 复用上次结果"""
+    finished_detect = Signal(dict, dict)    # {rel: [规则名]}, 新的缓存 {abs: (mtime, size, [规则名])}
 
-    def __init__(self, root_path, selected_paths, file_map, lang, redact_sensitive):
+    def __init__(self, file_map, cache, content_cache=None):
         super().__init__()
+        self.file_map = file_map
+        self.cache = cache
+        self.content_cache = content_cache
+
+    def run(self):
+        cache = {}
+        hits = {}
+        for rel_path, (abs_path, size, mtime) in self.file_map.items():
+            if self.isInterruptionRequested():
+                return
+            cached = self.cache.get(abs_path)
+            if cached is not None and cached[0] == mtime and cached[1] == size:
+                reasons = cached[2]
+            else:
+                reasons = detect_secrets(abs_path, size, self.content_cache)
+            cache[abs_path] = (mtime, size, reasons)
+            if sensitive_name_hit(rel_path):
+                reasons = ['filename'] + reasons
+            if reasons:
+                hits[rel_path] = reasons
+        self.finished_detect.emit(hits, cache)
+
+# ==================== Markdown 生成 ====================
+class MarkdownGenerator:
+    """Markdown 生成核心，不依赖 Qt，可在任意线程中使用"""
+
+    def __init__(self, root_path, selected_paths, file_map, lang, redact_sensitive,
+                 tree_max_depth=None, tree_max_width=None, tree_annotate=False,
+                 dedup=False, content_cache=None, records=False, compact=False, outline_threshold=None,
+                 workers=1, progress=None):
         self.root_path = root_path
         self.selected_paths = selected_paths
         self.file_map = file_map
         self.lang = lang
         self.redact_sensitive = redact_sensitive
-
-    def run(self):
-        lines = []
+        self.tree_max_depth = tree_max_depth
+        self.tree_max_width = tree_max_width
+        self.tree_annotate = tree_annotate
+        self.dedup = dedup
+        self.content_cache = content_cache
+        self.records = records          # 是否生成完整的文件记录（JSONL 输出）
+        self.compact = compact          # 是否去掉注释和多余空白
+        self.outline_threshold = outline_threshold  # 超过该字节数的文件只输出结构大纲，None 表示不启用
+        self.workers = workers          # 并行读取/处理文件的线程数
+        self.progress = progress        # 回调 progress(msg)
+        self.stats = {}
+
+    def generate(self):
+        return '\n'.join(self.iter_sections())
+
+    def iter_sections(self):
+        """按顺序产出文档片段，片段之间以换行连接即为完整文档"""
+        for section, _ in self.iter_entries():
+            yield section
+
+    def iter_entries(self):
+        """产出 (片段, 文件记录)；目录结构等非文件片段的记录为 None
+
+        records=True 时文件记录包含路径、扩展名、大小、编码、token 数、哈希、替换次数和内容，
+        否则文件记录只有 path 字段。
+        """
         root_name = os.path.basename(self.root_path)
         s = STRINGS[self.lang]
-
-        lines.append(f"# 项目概览：{root_name}\n")
+        self.stats = {
+            'files': 0, 'bytes': 0,
+            'dedup_files': 0, 'dedup_bytes_saved': 0, 'dedup_tokens_saved': 0,
+            'compact_tokens_saved': 0, 'compact_per_file': {},
+            'outline_files': 0, 'outline_tokens_saved': 0,
+        }
+        seen = {}   # digest -> 首次出现的相对路径
+
+        yield f"# 项目概览：{root_name}\n", None
         tree = self._build_tree(self.selected_paths)
-        lines.append("## 📁 目录结构\n")
-        lines.append("```\n" + tree + "```\n")
+        yield "## 📁 目录结构\n", None
+        yield "```\n" + tree + "```\n", None
 
         if not self.selected_paths:
-            lines.append("*(未选中任何文件)*")
-        else:
-            lines.append("## 📄 文件内容\n")
-            for i, rel_path in enumerate(self.selected_paths):
-                self.progress.emit(f"({i+1}/{len(self.selected_paths)}) {rel_path}")
-                abs_path, size = self.file_map[rel_path]
-
-                is_bin, reason = is_binary_file(abs_path)
-                if is_bin:
-                    lines.append(f"### `{rel_path}`\n```\n{s['binary_skipped'].format(reason)}\n```\n")
-                    continue
+            yield "*(未选中任何文件)*", None
+            return
 
-                try:
-                    content = read_text_file(abs_path)
-                    if self.redact_sensitive:
-                        content = redact_sensitive_content(content)
-                    ext = get_extension(rel_path)
-                    lang = ext if ext != '[无后缀]' else ''
-                    lines.append(f"### `{rel_path}`\n```{lang}\n{content}\n```\n")
-                except Exception as e:
-                    lines.append(f"### `{rel_path}`\n```\n{s['read_failed'].format(e)}\n```\n")
+        yield "## 📄 文件内容\n", None
+        total = len(self.selected_paths)
+        # 大文件先读（LPT），小文件成批读，结果仍按目录树顺序输出
+        sizes = [self.file_map[p][1] for p in self.selected_paths]
+        rendered = iter_scheduled(self._render_file, self.selected_paths, sizes, self.workers)
+        for i, (rel_path, section, record, digest, info) in enumerate(rendered):
+            if self.progress:
+                self.progress(f"({i+1}/{total}) {rel_path}")
+            if info:
+                self.stats['files'] += 1
+                self.stats['bytes'] += info['bytes']
+                if info['compact_saved'] > 0:
+                    self.stats['compact_tokens_saved'] += info['compact_saved']
+                    self.stats['compact_per_file'][rel_path] = info['compact_saved']
+                if info['outline_saved'] is not None:
+                    self.stats['outline_files'] += 1
+                    self.stats['outline_tokens_saved'] += info['outline_saved']
+
+            if self.dedup and digest is not None:
+                original = seen.get(digest)
+                if original is None:
+                    seen[digest] = rel_path
+                else:
+                    reference = f"### `{rel_path}`\n{s['dedup_reference'].format(original)}\n"
+                    if len(reference) < len(section):
+                        self.stats['dedup_files'] += 1
+                        self.stats['dedup_bytes_saved'] += len(section.encode('utf-8')) - len(reference.encode('utf-8'))
+                        self.stats['dedup_tokens_saved'] += estimate_tokens(section) - estimate_tokens(reference)
+                        section = reference
+                        if self.records:
+                            record.update(status='duplicate', duplicate_of=original, content=None, tokens=0)
+            yield section, record
+
+    def _render_file(self, rel_path):
+        """读取并渲染单个文件（可在工作线程中调用），返回 (路径, 片段, 记录, 内容哈希, 统计)"""
+        s = STRINGS[self.lang]
+        abs_path, size = self.file_map[rel_path][:2]
+        ext = get_extension(rel_path)
+        record = {'path': rel_path}
+        if self.records:
+            record.update(extension=ext, size=size, encoding=None, tokens=0, hash=None,
+                          redactions=0, status='ok', content=None)
 
-        self.result.emit('\n'.join(lines))
+        try:
+            digest, content, encoding, binary_reason, key = self._load(abs_path)
+        except Exception as e:
+            if self.records:
+                record.update(status='error', error=str(e))
+            return rel_path, f"### `{rel_path}`\n```\n{s['read_failed'].format(e)}\n```\n", record, None, None
+        if binary_reason:
+            if self.records:
+                record.update(status='binary', error=binary_reason)
+            return rel_path, f"### `{rel_path}`\n```\n{s['binary_skipped'].format(binary_reason)}\n```\n", record, None, None
+
+        info = {'bytes': len(content), 'compact_saved': 0, 'outline_saved': None}
+        lang = ext if ext != '[无后缀]' else ''
+        note = ''
+        if self.outline_threshold is not None and size > self.outline_threshold:
+            outline = load_outline(abs_path, content, ext, self.content_cache, key)
+            info['outline_saved'] = estimate_tokens(content) - estimate_tokens(outline)
+            note = s['outline_note'].format(format_bytes(size)) + '\n'
+            content = outline
+        elif self.compact:
+            compacted = compact_content(content, ext)
+            info['compact_saved'] = estimate_tokens(content) - estimate_tokens(compacted)
+            content = compacted
+        redactions = 0
+        if self.redact_sensitive:
+            content, redactions = redact_with_count(content)
+        if self.records:
+            record.update(encoding=encoding, tokens=estimate_tokens(content), hash=digest,
+                          redactions=redactions, content=content, compact_tokens_saved=info['compact_saved'],
+                          outline=info['outline_saved'] is not None)
+        return rel_path, f"### `{rel_path}`\n{note}```{lang}\n{content}\n```\n", record, digest, info
+
+    def _load(self, abs_path):
+        return load_file(abs_path, self.content_cache)
 
     def _build_tree(self, paths):
         if not paths:
             return f"{os.path.basename(self.root_path)}/\n└── (无选中文件)"
 
-        tree_dict = {}
-        for p in paths:
-            parts = p.split('/')
-            node = tree_dict
-            for part in parts[:-1]:
-                node = node.setdefault(part, {})
-            node[parts[-1]] = None
-
-        def _render(subtree, prefix='', is_last=True):
-            if not subtree:
-                return ''
-            items = list(subtree.items())
-            items.sort(key=lambda x: (0 if isinstance(x[1], dict) else 1, x[0].lower()))
-
-            result = ''
-            for i, (name, child) in enumerate(items):
-                last = (i == len(items) - 1)
-                line = prefix + ('└── ' if last else '├── ') + name
-                if isinstance(child, dict):
-                    line += '/'
-                result += line + '\n'
-                if isinstance(child, dict):
-                    result += _render(child, prefix + ('    ' if last else '│   '), last)
-            return result
+        s = STRINGS[self.lang]
+        sizes = {p: self.file_map[p][1] for p in paths if p in self.file_map} if self.tree_annotate else None
+        return render_tree(paths, os.path.basename(self.root_path), sizes=sizes,
+                           max_depth=self.tree_max_depth, max_width=self.tree_max_width,
+                           annotate=self.tree_annotate,
+                           more_fmt=s['tree_more'], annotation_fmt=s['tree_annotation'])
+
+# ==================== 流式输出 ====================
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst'}
+
+def compression_from_path(path):
+    """根据文件后缀判断压缩格式，未压缩返回 None"""
+    lower = path.lower()
+    for name, suffix in COMPRESSION_SUFFIXES.items():
+        if lower.endswith(suffix):
+            return name
+    return None
+
+def open_compressed(path, compression=None):
+    """以二进制写方式打开输出文件，compression 为 None/'gzip'/'xz'/'zstd'"""
+    if compression is None:
+        return open(path, 'wb')
+    # 压缩模块只在导出压缩文件时导入，不拖慢界面启动
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(path, 'wb', compresslevel=3)   # 速度优先，压缩率与 6 相差不大
+    if compression == 'xz':
+        import lzma
+        return lzma.open(path, 'wb')
+    if compression == 'zstd':
+        zstandard = zstd_module()
+        if zstandard is None:
+            raise RuntimeError("未安装 zstandard：pip install zstandard")
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, 'wb'), closefd=True)
+    raise ValueError(f"不支持的压缩格式: {compression}")
+
+def _split_output_path(path, compression):
+    """'out/a.md.gz' -> ('out/a', '.md', '.gz')"""
+    suffix = COMPRESSION_SUFFIXES.get(compression, '')
+    base = path[:len(path) - len(suffix)] if suffix and path.endswith(suffix) else path
+    stem, ext = os.path.splitext(base)
+    return stem, ext, suffix
+
+def _part_path(path, compression, index):
+    stem, ext, suffix = _split_output_path(path, compression)
+    return f"{stem}.part{index:03d}{ext}{suffix}"
+
+def write_sections(sections, path, compression=None, part_bytes=None, bundle=None, on_section=None):
+    """把文档片段流式写入文件，压缩在独立的写线程中进行，与读取文件并行
+
+    part_bytes: 按未压缩字节数切分为多个分片（只在片段边界切分）
+    bundle: 'tar' 或 'zip'，把分片打包为一个归档文件
+    on_section: 回调 on_section(序号, 分片文件名, 字节偏移, 字节长度)，偏移相对未压缩内容
+    返回 {'paths': 最终输出文件列表, 'bytes_in': 未压缩字节数, 'bytes_out': 输出字节数}
+    """
+    split_parts = bool(part_bytes or bundle)
+    chunks = queue.Queue(maxsize=64)
+    written = []
+    errors = []
+    split_marker = object()
+
+    def writer():
+        out = None
+        pending = []        # 攒够 1MB 再交给压缩器，减少逐段调用的开销
+        pending_size = 0
+        try:
+            for item in iter(chunks.get, None):
+                if errors:
+                    continue    # 出错后只负责取空队列，避免生产者阻塞
+                try:
+                    if item is split_marker or out is None:
+                        if out is not None:
+                            out.write(b''.join(pending))
+                            out.close()
+                        pending, pending_size = [], 0
+                        target = _part_path(path, compression, len(written) + 1) if split_parts else path
+                        written.append(target)
+                        out = open_compressed(target, compression)
+                        if item is split_marker:
+                            continue
+                    pending.append(item)
+                    pending_size += len(item)
+                    if pending_size >= 1024 * 1024:
+                        out.write(b''.join(pending))
+                        pending, pending_size = [], 0
+                except Exception as e:
+                    errors.append(e)
+        finally:
+            if out is not None:
+                try:
+                    if not errors:
+                        out.write(b''.join(pending))
+                    out.close()
+                except Exception as e:
+                    errors.append(e)
 
-        root_name = os.path.basename(self.root_path)
-        return root_name + '/\n' + _render(tree_dict)
+    thread = threading.Thread(target=writer, name='repo2md-writer', daemon=True)
+    thread.start()
+    bytes_in = 0
+    current = 0
+    part = 1
+    try:
+        chunks.put(b'')     # 先打开第一个输出文件，空文档也会生成文件
+        for i, section in enumerate(sections):
+            data = section.encode('utf-8')
+            if part_bytes and current and current + 1 + len(data) > part_bytes:
+                chunks.put(split_marker)
+                part += 1
+                current = 0
+            if current:
+                chunks.put(b'\n')
+                current += 1
+                bytes_in += 1
+            if on_section:
+                name = os.path.basename(_part_path(path, compression, part) if split_parts else path)
+                on_section(i, name, current, len(data))
+            chunks.put(data)
+            current += len(data)
+            bytes_in += len(data)
+    finally:
+        chunks.put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    paths = written
+    if bundle:
+        archive = _split_output_path(path, compression)[0] + '.' + bundle
+        if bundle == 'zip':
+            import zipfile
+            method = zipfile.ZIP_STORED if compression else zipfile.ZIP_DEFLATED
+            with zipfile.ZipFile(archive, 'w', compression=method) as zf:
+                for part in written:
+                    zf.write(part, os.path.basename(part))
+        elif bundle == 'tar':
+            import tarfile
+            with tarfile.open(archive, 'w') as tf:
+                for part in written:
+                    tf.add(part, arcname=os.path.basename(part))
+        else:
+            raise ValueError(f"不支持的打包格式: {bundle}")
+        for part in written:
+            os.remove(part)
+        paths = [archive]
+    return {
+        'paths': paths,
+        'bytes_in': bytes_in,
+        'bytes_out': sum(os.path.getsize(p) for p in paths),
+    }
+
+def write_markdown_outputs(generator, path, compression=None, part_bytes=None, bundle=None,
+                           jsonl_path=None, index_path=None, count_tokens=False):
+    """一次遍历同时写出 Markdown、JSONL 文件记录和 Markdown 字节偏移索引
+
+    jsonl_path: 每个文件一行 JSON（需要 generator.records=True 才包含完整字段）
+    index_path: 每个文件一行 {"path", "part", "offset", "length"}，可直接 seek 到对应片段
+    count_tokens: 同时估算整个文档的 token 数（结果中的 'tokens'）
+    """
+    tokens = 0
+    jsonl = open_compressed(jsonl_path, compression_from_path(jsonl_path)) if jsonl_path else None
+    index = open_compressed(index_path, compression_from_path(index_path)) if index_path else None
+    paths_by_section = {}
+    try:
+        def entries():
+            nonlocal tokens
+            for i, (section, record) in enumerate(generator.iter_entries()):
+                if count_tokens:
+                    tokens += estimate_tokens(section)
+                if record is not None:
+                    paths_by_section[i] = record['path']
+                    if jsonl:
+                        jsonl.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+                yield section
+
+        def on_section(i, part, offset, length):
+            rel_path = paths_by_section.pop(i, None)
+            if index and rel_path is not None:
+                line = {'path': rel_path, 'part': part, 'offset': offset, 'length': length}
+                index.write(json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        written = write_sections(entries(), path, compression, part_bytes, bundle, on_section=on_section)
+    finally:
+        for f in (jsonl, index):
+            if f is not None:
+                f.close()
+    for extra in (jsonl_path, index_path):
+        if extra:
+            written['paths'].append(extra)
+    written['tokens'] = tokens
+    return written
+
+def write_jsonl(generator, path):
+    """只写出 JSONL 文件记录（每个文件一行），后缀为 .gz/.xz/.zst 时压缩"""
+    def lines():
+        for _, record in generator.iter_entries():
+            if record is not None:
+                yield json.dumps(record, ensure_ascii=False)
+        yield ''    # 末尾换行
+    return write_sections(lines(), path, compression_from_path(path))
+
+# ==================== 生成 Markdown 线程 ====================
+class GenerateThread(QThread):
+    progress = Signal(str)      # 当前处理的文件
+    result = Signal(str)        # 最终markdown内容
+    stats_ready = Signal(dict)  # 生成统计（去重节省等）
+
+    def __init__(self, root_path, selected_paths, file_map, lang, redact_sensitive, **options):
+        super().__init__()
+        self.generator = MarkdownGenerator(root_path, selected_paths, file_map, lang,
+                                           redact_sensitive, progress=self.progress.emit, **options)
+
+    def run(self):
+        markdown_text = self.generator.generate()
+        self.stats_ready.emit(self.generator.stats)
+        self.result.emit(markdown_text)
+
+    def _build_tree(self, paths):
+        return self.generator._build_tree(paths)
+
+# ==================== 导出线程 ====================
+class ExportThread(QThread):
+    """在后台执行需要重新读取文件的导出任务"""
+    finished_export = Signal(str)   # 出错信息，成功时为空
+
+    def __init__(self, func):
+        super().__init__()
+        self.func = func
+
+    def run(self):
+        try:
+            self.func()
+        except Exception as e:
+            self.finished_export.emit(str(e) or type(e).__name__)
+        else:
+            self.finished_export.emit('')
 
 # ==================== 扩展名+搜索过滤代理模型 ====================
 class FileFilterProxy(QSortFilterProxyModel):
@@ -358,6 +1666,23 @@ class MainWindow(QMainWindow):
         self.selected_paths = []
         self.ext_list = []
         self._updating = False
+        self.content_cache = ContentCache()
+        self.secret_cache = {}      # abs_path -> (mtime, size, [规则名])
+        self.secret_hits = {}       # rel_path -> [规则名]
+        self.secret_marked = set()  # 文件树中已标为橙色的 rel_path，下次检测后清除不再命中的
+        self.file_items = {}        # rel_path -> QStandardItem
+        self.dir_items = {}         # 目录相对路径（根目录为 ''）-> QStandardItem
+        self.aggregates = aggregate_file_map({})    # 扫描时计算的按扩展名/目录统计
+        self.allowed_extensions = None  # 扩展名筛选，None 表示全部
+        self.selected_by_ext = {}   # ext -> [选中文件数, 字节数]，勾选变化时更新
+        data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        self.session_dir = os.path.join(data_dir, 'sessions') if data_dir else None
+        self.scan_thread = None
+        self._scan_threads = set()      # 保持引用，直到线程真正结束
+        self.scan_generation = 0        # 每次开始扫描加一，旧扫描的结果按 (根目录, 代号) 丢弃
+        self.scan_dlg = None            # 模态扫描的进度框，与生成/导出的 progress_dlg 分开
+        self.secret_thread = None
+        self._secret_threads = set()    # 保持引用，直到线程真正结束
         self.fs_watcher = QFileSystemWatcher(self)
         self.fs_watcher.directoryChanged.connect(self.on_directory_changed)
         self.fs_watcher.fileChanged.connect(self.on_file_changed)
@@ -422,8 +1747,10 @@ class MainWindow(QMainWindow):
         self.search_edit = QLineEdit()
         self.search_edit.setPlaceholderText(STRINGS[self.current_lang]['search_placeholder'])
         self.search_edit.textChanged.connect(self.on_search_text_changed)
+        self.changed_since_edit = QLineEdit()
         search_layout.addWidget(self.search_label)
-        search_layout.addWidget(self.search_edit)
+        search_layout.addWidget(self.search_edit, 2)
+        search_layout.addWidget(self.changed_since_edit, 1)
         right_layout.addLayout(search_layout)
 
         # 文件树标签与敏感内容过滤复选框放在同一行
@@ -438,6 +1765,23 @@ class MainWindow(QMainWindow):
         self.sensitive_checkbox = QCheckBox()
         self.sensitive_checkbox.setFont(font)  # 同样放大
         tree_header_layout.addWidget(self.sensitive_checkbox)
+
+        self.dedup_checkbox = QCheckBox()
+        self.dedup_checkbox.setFont(font)
+        tree_header_layout.addWidget(self.dedup_checkbox)
+
+        self.compact_checkbox = QCheckBox()
+        self.compact_checkbox.setFont(font)
+        tree_header_layout.addWidget(self.compact_checkbox)
+
+        self.outline_checkbox = QCheckBox()
+        self.outline_checkbox.setFont(font)
+        tree_header_layout.addWidget(self.outline_checkbox)
+
+        self.git_index_checkbox = QCheckBox()
+        self.git_index_checkbox.setFont(font)
+        self.git_index_checkbox.toggled.connect(self.on_scan_source_changed)
+        tree_header_layout.addWidget(self.git_index_checkbox)
         tree_header_layout.addStretch()  # 右侧弹性空间
 
         right_layout.addLayout(tree_header_layout)
@@ -478,12 +1822,15 @@ class MainWindow(QMainWindow):
         self.export_html_btn.clicked.connect(self.export_html)
         self.export_pdf_btn = QPushButton()
         self.export_pdf_btn.clicked.connect(self.export_pdf)
+        self.export_jsonl_btn = QPushButton()
+        self.export_jsonl_btn.clicked.connect(self.export_jsonl)
         info_layout.addWidget(self.size_label, 1)
         info_layout.addWidget(self.generate_btn)
         info_layout.addWidget(self.copy_btn)
         info_layout.addWidget(self.export_md_btn)
         info_layout.addWidget(self.export_html_btn)
         info_layout.addWidget(self.export_pdf_btn)
+        info_layout.addWidget(self.export_jsonl_btn)
         output_layout.addLayout(info_layout)
 
         self.output_edit = QTextEdit()
@@ -501,6 +1848,7 @@ class MainWindow(QMainWindow):
         self.tree_model.itemChanged.connect(self.on_item_changed)
 
         self.progress_dlg = None
+        self.last_generate_args = None
 
     def apply_dark_theme(self):
         QApplication.setStyle('Fusion')
@@ -607,23 +1955,116 @@ class MainWindow(QMainWindow):
         self.export_md_btn.setText(s['export_md'])
         self.export_html_btn.setText(s['export_html'])
         self.export_pdf_btn.setText(s['export_pdf'])
+        self.export_jsonl_btn.setText(s['export_jsonl'])
         self.search_edit.setPlaceholderText(s['search_placeholder'])
-        self.size_label.setText(s['size_label'].format("0 B"))
+        self.update_size_label()
+        self.update_aggregate_labels()
         self.sensitive_checkbox.setText(s['sensitive_filter'])
+        self.dedup_checkbox.setText(s['dedup'])
+        self.git_index_checkbox.setText(s['git_index'])
+        self.compact_checkbox.setText(s['compact'])
+        self.outline_checkbox.setText(s['outline'])
+        self.outline_checkbox.setToolTip(format_bytes(OUTLINE_DEFAULT_THRESHOLD) + ' +')
+        self.changed_since_edit.setPlaceholderText(s['changed_since_placeholder'])
 
     def on_language_changed(self, index):
         self.current_lang = 'zh' if index == 0 else 'en'
         self.retranslate_ui()
 
+    # ---------- 项目会话 ----------
+    def settings(self):
+        return QSettings('repo2md', 'repo2md_gui')
+
+    def save_last_session(self):
+        if not self.root_path:
+            return
+        self.settings().setValue('last_folder', self.root_path)
+        self.save_project_session()
+
+    def restore_last_session(self):
+        """窗口显示后调用：打开上次的文件夹（有会话快照时立即显示），在后台重新扫描"""
+        folder = self.settings().value('last_folder')
+        if self.root_path or not folder or not os.path.isdir(folder):
+            return
+        self.open_folder(folder, background=True)
+
+    def collect_session(self):
+        disabled = [self.ext_list_widget.item(i).data(Qt.UserRole) for i in range(self.ext_list_widget.count())
+                    if self.ext_list_widget.item(i).checkState() != Qt.Checked]
+        return {
+            'version': SESSION_VERSION,
+            'root': self.root_path,
+            'source': 'git' if self.git_index_checkbox.isChecked() else 'fs',
+            'selection': self.selected_paths,
+            'disabled_extensions': disabled,
+            'search': self.search_edit.text(),
+            'changed_since': self.changed_since_edit.text(),
+            'redact': self.sensitive_checkbox.isChecked(),
+            'dedup': self.dedup_checkbox.isChecked(),
+            'compact': self.compact_checkbox.isChecked(),
+            'outline': self.outline_checkbox.isChecked(),
+            'snapshot': snapshot_from_file_map(self.file_map),
+        }
+
+    def save_project_session(self):
+        if not self.session_dir or not self.root_path or not self.file_map:
+            return
+        try:
+            save_session(session_file(self.session_dir, self.root_path), self.collect_session())
+        except OSError:
+            pass    # 会话只是加速下次打开，写不进去不影响使用
+
+    def apply_session(self, session):
+        """用会话快照立即重建文件树，并恢复选中、筛选和生成选项"""
+        self.git_index_checkbox.blockSignals(True)
+        self.git_index_checkbox.setChecked(session.get('source') == 'git')
+        self.git_index_checkbox.blockSignals(False)
+        self.sensitive_checkbox.setChecked(session.get('redact', False))
+        self.dedup_checkbox.setChecked(session.get('dedup', False))
+        self.compact_checkbox.setChecked(session.get('compact', False))
+        self.outline_checkbox.setChecked(session.get('outline', False))
+        self.changed_since_edit.setText(session.get('changed_since', ''))
+        self.search_edit.setText(session.get('search', ''))
+
+        self.file_map = file_map_from_snapshot(self.root_path, session.get('snapshot', {}))
+        self.aggregates = aggregate_file_map(self.file_map)
+        self.rebuild_tree(session.get('selection', []))
+        extensions = _sorted_extensions({get_extension(rel) for rel in self.file_map})
+        self.set_extension_list(extensions, disabled=set(session.get('disabled_extensions', [])))
+
+    def closeEvent(self, event):
+        self.save_last_session()
+        # 仍在运行的后台线程必须结束后才能销毁
+        for thread in self._scan_threads | self._secret_threads:
+            thread.requestInterruption()
+            thread.wait()
+        super().closeEvent(event)
+
     # ---------- 文件夹选择与自动刷新 ----------
     def choose_folder(self):
         folder = QFileDialog.getExistingDirectory(self, STRINGS[self.current_lang]['choose_folder'])
         if not folder:
             return
+        self.open_folder(folder)
+
+    def open_folder(self, folder, background=False):
+        """打开文件夹：有会话快照时先显示缓存的文件树，再在后台扫描并只应用差异"""
+        if self.root_path and self.root_path != folder:
+            self.save_project_session()
         self.root_path = folder
         self.path_label.setText(folder)
-        self.setup_file_watcher()
-        self.start_scan()
+        session = load_session(session_file(self.session_dir, folder)) if self.session_dir else None
+        if session is not None:
+            self.apply_session(session)
+            self.start_scan(modal=False, incremental=True)
+        else:
+            self.file_map = {}
+            self.start_scan(modal=not background)
+        if background:
+            # 监视器需要遍历整个目录，放到事件循环空闲时再做
+            QTimer.singleShot(0, self.setup_file_watcher)
+        else:
+            self.setup_file_watcher()
 
     def setup_file_watcher(self):
         """设置文件系统监视器"""
@@ -659,43 +2100,199 @@ class MainWindow(QMainWindow):
         if not self.pending_refresh:
             return
         self.pending_refresh = False
-        # 保存当前选中状态
-        old_selected = self.selected_paths.copy()
-        self.start_scan(restore_selected=old_selected)
-
-    def start_scan(self, restore_selected=None):
-        self.progress_dlg = QProgressDialog(STRINGS[self.current_lang]['scanning'], None, 0, 0, self)
-        self.progress_dlg.setWindowModality(Qt.WindowModal)
-        self.progress_dlg.show()
+        # 增量更新：选中状态保留在未变化的节点上
+        self.start_scan(modal=False, incremental=True)
+
+    def start_scan(self, modal=True, incremental=False):
+        """开始扫描；非模态扫描运行期间可能再次开始扫描，此时旧扫描的结果作废"""
+        if self.scan_dlg:
+            self.scan_dlg.close()
+        self.scan_dlg = None
+        if modal:
+            self.scan_dlg = QProgressDialog(STRINGS[self.current_lang]['scanning'], None, 0, 0, self)
+            self.scan_dlg.setWindowModality(Qt.WindowModal)
+            self.scan_dlg.show()
+        else:
+            self.statusBar().showMessage(STRINGS[self.current_lang]['scanning'])
+
+        source = 'git' if self.git_index_checkbox.isChecked() else 'fs'
+        self.scan_generation += 1
+        token = (self.root_path, self.scan_generation)
+        thread = ScanThread(self.root_path, source)
+        thread.finished_scan.connect(
+            lambda fm, ext, aggregates: self.on_scan_finished(fm, ext, aggregates, incremental, token))
+        thread.finished.connect(lambda t=thread: self._scan_threads.discard(t))
+        self._scan_threads.add(thread)
+        self.scan_thread = thread
+        thread.start()
+
+    def on_scan_source_changed(self, checked):
+        if self.root_path:
+            self.start_scan(modal=False, incremental=True)
+
+    def on_scan_finished(self, file_map, extensions, aggregates, incremental=False, token=None):
+        if token is not None and token != (self.root_path, self.scan_generation):
+            return  # 已被新的扫描（或另一个文件夹）取代
+        if self.scan_dlg:
+            self.scan_dlg.close()
+            self.scan_dlg = None
+        else:
+            self.statusBar().clearMessage()
 
-        self.scan_thread = ScanThread(self.root_path)
-        self.scan_thread.finished_scan.connect(lambda fm, ext: self.on_scan_finished(fm, ext, restore_selected))
-        self.scan_thread.start()
+        self.aggregates = aggregates
+        if incremental and self.file_items:
+            self.apply_scan_diff(file_map, extensions)
+        else:
+            self.file_map = file_map
+            self.rebuild_tree()
+            self.set_extension_list(extensions)
 
-    def on_scan_finished(self, file_map, extensions, restore_selected=None):
-        self.progress_dlg.close()
-        self.file_map = file_map
-        self.ext_list = extensions
+        self.start_secret_scan()
 
-        # 重建树模型
+    def rebuild_tree(self, selected=None):
+        """整体重建树模型；重建期间断开过滤代理，避免每插入一行都重新过滤"""
+        self.proxy_model.setSourceModel(None)
         self.tree_model.clear()
-        self.ext_list_widget.clear()
         self.build_tree_model()
+        self.update_aggregate_labels()
+        if selected:
+            self.restore_selected_paths(selected)
+        self.proxy_model.setSourceModel(self.tree_model)
+        self.tree_view.expandToDepth(1)
 
+    def set_extension_list(self, extensions, disabled=()):
+        """重建扩展名列表，disabled 中的扩展名保持未勾选"""
+        self.ext_list = extensions
+        self.ext_list_widget.blockSignals(True)
+        self.ext_list_widget.clear()
         for ext in extensions:
             item = QListWidgetItem(ext)
+            item.setData(Qt.UserRole, ext)
             item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-            item.setCheckState(Qt.Checked)
+            item.setCheckState(Qt.Unchecked if ext in disabled else Qt.Checked)
             self.ext_list_widget.addItem(item)
+        self.update_extension_labels()
+        self.ext_list_widget.blockSignals(False)
+        self.on_extension_filter_changed(None)
 
-        self.proxy_model.set_allowed_extensions(extensions)
+    def update_extension_labels(self):
+        """扩展名列表显示文件数、大小和估算 token，悬停显示大小分布"""
+        s = STRINGS[self.current_lang]
+        labels = size_histogram_labels()
+        by_ext = self.aggregates['extensions']
+        for i in range(self.ext_list_widget.count()):
+            item = self.ext_list_widget.item(i)
+            ext = item.data(Qt.UserRole)
+            agg = by_ext.get(ext)
+            if agg is None:
+                item.setText(ext)
+                continue
+            item.setText(f"{ext}  ({s['ext_stats'].format(agg['files'], format_bytes(agg['bytes']), agg['tokens'])})")
+            item.setToolTip(s['size_histogram'] + '\n' + '\n'.join(
+                f"{label}: {count}" for label, count in zip(labels, agg['histogram'])))
+
+    def update_aggregate_labels(self):
+        """目录节点显示其下（含子目录）的文件数与大小，悬停显示估算 token"""
+        s = STRINGS[self.current_lang]
+        by_dir = self.aggregates['dirs']
+        self.ext_list_widget.blockSignals(True)
+        self.update_extension_labels()
+        self.ext_list_widget.blockSignals(False)
+        was_updating, self._updating = self._updating, True
+        for dir_path, item in self.dir_items.items():
+            agg = by_dir.get(dir_path)
+            name = dir_path.rpartition('/')[2] if dir_path else os.path.basename(self.root_path)
+            if agg is None:
+                item.setText(name + '/')
+                continue
+            item.setText(f"{name}/ ({s['dir_stats'].format(agg['files'], format_bytes(agg['bytes']))})")
+            item.setToolTip(f"~{agg['tokens']} token")
+        self._updating = was_updating
+
+    def apply_scan_diff(self, file_map, extensions):
+        """只把新增、删除和变化的文件应用到现有树模型，其余节点（及其选中状态）保持不动"""
+        added, removed, changed = diff_file_maps(self.file_map, file_map)
+        self.file_map = file_map
+        if not (added or removed or changed) and extensions == self.ext_list:
+            return
+
+        touched = set()     # 需要重新计算三态的目录
+        self._updating = True
+        for rel_path in removed:
+            item = self.file_items.pop(rel_path, None)
+            if item is None:
+                continue
+            dir_path = rel_path.rpartition('/')[0]
+            parent = item.parent()
+            parent.removeRow(item.row())
+            # 删除变空的目录
+            while dir_path and parent.rowCount() == 0:
+                grand_parent = parent.parent()
+                grand_parent.removeRow(parent.row())
+                del self.dir_items[dir_path]
+                dir_path = dir_path.rpartition('/')[0]
+                parent = grand_parent
+            touched.add(dir_path)
+        for rel_path in changed:
+            item = self.file_items.get(rel_path)
+            if item is not None:
+                size = file_map[rel_path][1]
+                item.setText(f"{rel_path.rpartition('/')[2]} ({format_bytes(size)})")
+                item.setData(size, Qt.UserRole + 2)
+        for rel_path in added:
+            dir_path = rel_path.rpartition('/')[0]
+            self._ensure_dir_item(dir_path).appendRow(self._make_file_item(rel_path, file_map[rel_path][1]))
+            touched.add(dir_path)
+        for dir_path in touched:
+            item = self.dir_items.get(dir_path)
+            if item is not None:
+                self._update_parent_tristate(item)
+        self._updating = False
+        if extensions != self.ext_list:
+            disabled = {self.ext_list_widget.item(i).data(Qt.UserRole) for i in range(self.ext_list_widget.count())
+                        if self.ext_list_widget.item(i).checkState() != Qt.Checked}
+            self.set_extension_list(extensions, disabled)
+        self.update_aggregate_labels()
+        self.update_selected_size()
 
-        # 尝试恢复选中状态
-        if restore_selected:
-            self.restore_selected_paths(restore_selected)
+    # ---------- 后台敏感信息检测 ----------
+    def start_secret_scan(self):
+        if self.secret_thread is not None and self.secret_thread.isRunning():
+            self.secret_thread.requestInterruption()
+        self.secret_hits = {}
+        thread = SecretScanThread(self.file_map, self.secret_cache, self.content_cache)
+        thread.finished_detect.connect(lambda hits, cache, t=thread: self.on_secret_scan_finished(t, hits, cache))
+        thread.finished.connect(lambda t=thread: self._secret_threads.discard(t))
+        self._secret_threads.add(thread)
+        self.secret_thread = thread
+        thread.start()
+
+    def on_secret_scan_finished(self, thread, hits, cache):
+        if thread is not self.secret_thread:
+            return  # 已被新的扫描取代
+        self.secret_cache = cache
+        self.secret_hits = hits
+        s = STRINGS[self.current_lang]
+        # 增量重扫会保留原有节点，上次命中而这次不再命中的要恢复原样
+        for rel_path in self.secret_marked - hits.keys():
+            item = self.file_items.get(rel_path)
+            if item is not None:
+                item.setData(None, Qt.ForegroundRole)
+                item.setToolTip('')
+        self.secret_marked = set(hits)
+        warn_color = QColor(240, 136, 62)
+        for rel_path, reasons in hits.items():
+            item = self.file_items.get(rel_path)
+            if item is not None:
+                item.setForeground(warn_color)
+                item.setToolTip(s['secret_tooltip'].format(', '.join(reasons)))
+        if hits:
+            self.statusBar().showMessage(s['secret_found'].format(len(hits)))
 
     def restore_selected_paths(self, paths):
         """根据路径列表恢复选中状态"""
+        # 批量修改期间不逐个触发 on_item_changed，最后统一计算三态和大小
+        self._updating = True
         # 首先清除所有选中
         root = self.tree_model.invisibleRootItem()
         self._set_all_checked(root, False)
@@ -704,11 +2301,23 @@ class MainWindow(QMainWindow):
         for rel_path in paths:
             self._check_path(rel_path)
 
-        # 更新三态和大小
+        for row in range(root.rowCount()):
+            self._sync_dir_states(root.child(row))
+        self._updating = False
         self.update_selected_size()
-        # 触发父节点三态更新
-        root = self.tree_model.invisibleRootItem()
-        self._update_parent_tristate(root)
+
+    def _sync_dir_states(self, item):
+        """自底向上重新计算目录节点的三态"""
+        states = set()
+        for row in range(item.rowCount()):
+            child = item.child(row)
+            if child.hasChildren():
+                self._sync_dir_states(child)
+            states.add(child.checkState())
+        if states:
+            new_state = states.pop() if len(states) == 1 else Qt.PartiallyChecked
+            if item.checkState() != new_state:
+                item.setCheckState(new_state)
 
     def _set_all_checked(self, parent_item, checked):
         """递归设置所有文件节点的选中状态"""
@@ -721,23 +2330,9 @@ class MainWindow(QMainWindow):
 
     def _check_path(self, rel_path):
         """根据相对路径选中文件节点"""
-        parts = rel_path.split('/')
-        current = self.tree_model.invisibleRootItem()
-        for part in parts:
-            found = None
-            for row in range(current.rowCount()):
-                child = current.child(row)
-                display = child.data(Qt.DisplayRole)
-                # 目录显示为 part/，文件显示为 part (size)
-                if display.startswith(part + '/') or display.startswith(part + ' ('):
-                    found = child
-                    break
-            if not found:
-                return
-            current = found
-        # 找到文件节点，选中它
-        if current and not current.hasChildren():
-            current.setCheckState(Qt.Checked)
+        item = self.file_items.get(rel_path)
+        if item is not None:
+            item.setCheckState(Qt.Checked)
 
     # ---------- 构建树模型 ----------
     def build_tree_model(self):
@@ -749,6 +2344,7 @@ class MainWindow(QMainWindow):
         self.tree_model.appendRow(root_item)
 
         path_to_item = {'': root_item}
+        self.dir_items = path_to_item
 
         all_paths = list(self.file_map.keys())
         dirs = set()
@@ -771,30 +2367,49 @@ class MainWindow(QMainWindow):
             parent_item.appendRow(dir_item)
             path_to_item[d] = dir_item
 
-        for rel_path, (abs_path, size) in self.file_map.items():
+        self.file_items = {}
+        for rel_path, (abs_path, size, _) in self.file_map.items():
             parts = rel_path.split('/')
             parent_path = '/'.join(parts[:-1])
             parent_item = path_to_item.get(parent_path, root_item)
-            file_name = parts[-1]
-            display_text = f"{file_name} ({format_bytes(size)})"
-            file_item = QStandardItem(display_text)
-            file_item.setEditable(False)
-            file_item.setCheckable(True)
-            file_item.setData(get_extension(rel_path), Qt.UserRole)
-            file_item.setData(rel_path, Qt.UserRole + 1)
-            file_item.setData(size, Qt.UserRole + 2)
-            parent_item.appendRow(file_item)
+            parent_item.appendRow(self._make_file_item(rel_path, size))
 
         self.tree_view.expandToDepth(1)
 
+    def _make_file_item(self, rel_path, size):
+        file_item = QStandardItem(f"{rel_path.rpartition('/')[2]} ({format_bytes(size)})")
+        file_item.setEditable(False)
+        file_item.setCheckable(True)
+        file_item.setData(get_extension(rel_path), Qt.UserRole)
+        file_item.setData(rel_path, Qt.UserRole + 1)
+        file_item.setData(size, Qt.UserRole + 2)
+        self.file_items[rel_path] = file_item
+        return file_item
+
+    def _ensure_dir_item(self, dir_path):
+        """返回目录节点，不存在时逐级创建"""
+        item = self.dir_items.get(dir_path)
+        if item is None:
+            parent_path, _, name = dir_path.rpartition('/')
+            item = QStandardItem(name + '/')
+            item.setEditable(False)
+            item.setCheckable(True)
+            item.setData(None, Qt.UserRole)
+            self._ensure_dir_item(parent_path).appendRow(item)
+            self.dir_items[dir_path] = item
+        return item
+
     # ---------- 扩展名筛选 ----------
     def on_extension_filter_changed(self, item):
         allowed = []
         for i in range(self.ext_list_widget.count()):
             it = self.ext_list_widget.item(i)
             if it.checkState() == Qt.Checked:
-                allowed.append(it.text())
+                allowed.append(it.data(Qt.UserRole))
+        self.allowed_extensions = set(allowed) if allowed else None
         self.proxy_model.set_allowed_extensions(allowed if allowed else None)
+        # 选中总计按扩展名预先汇总，切换扩展名时无需重新遍历文件树
+        self.update_size_label()
 
     # ---------- 搜索 ----------
     def on_search_text_changed(self, text):
@@ -871,36 +2486,63 @@ class MainWindow(QMainWindow):
                 self._update_parent_tristate(root)
 
     def update_selected_size(self):
-        total = 0
         self.selected_paths = []
+        self.selected_by_ext = {}
         root = self.tree_model.invisibleRootItem()
-        total = self._accumulate_selected(root, self.selected_paths)
+        self._accumulate_selected(root, self.selected_paths, self.selected_by_ext)
+        self.update_size_label()
+
+    def update_size_label(self):
+        """按扩展名筛选汇总选中的文件数、大小和估算 token（只累加各扩展名的小计）"""
+        files = total = 0
+        for ext, (count, size) in self.selected_by_ext.items():
+            if self.allowed_extensions is None or ext in self.allowed_extensions:
+                files += count
+                total += size
         s = STRINGS[self.current_lang]
-        self.size_label.setText(s['size_label'].format(format_bytes(total)))
+        self.size_label.setText(s['size_label'].format(files, format_bytes(total), total // 4))
 
-    def _accumulate_selected(self, parent_item, paths):
-        total = 0
+    def effective_selected_paths(self):
+        """参与生成的文件：已勾选且扩展名未被筛选掉"""
+        if self.allowed_extensions is None:
+            return self.selected_paths
+        return [p for p in self.selected_paths if get_extension(p) in self.allowed_extensions]
+
+    def _accumulate_selected(self, parent_item, paths, by_ext):
         for row in range(parent_item.rowCount()):
             child = parent_item.child(row)
             if child.hasChildren():
-                total += self._accumulate_selected(child, paths)
+                self._accumulate_selected(child, paths, by_ext)
             else:
                 if child.checkState() == Qt.Checked:
-                    size = child.data(Qt.UserRole + 2)
-                    total += size
                     rel_path = child.data(Qt.UserRole + 1)
                     if rel_path:
                         paths.append(rel_path)
-        return total
+                        totals = by_ext.setdefault(child.data(Qt.UserRole), [0, 0])
+                        totals[0] += 1
+                        totals[1] += child.data(Qt.UserRole + 2)
 
     # ---------- 生成 Markdown ----------
     def generate_markdown(self):
         s = STRINGS[self.current_lang]
-        if not self.selected_paths:
+        selected_paths = self.effective_selected_paths()
+        if not selected_paths:
             QMessageBox.warning(self, s['warning'], s['no_selection'])
             return
 
-        sensitive = [p for p in self.selected_paths if any(k in p.lower() for k in SENSITIVE_KEYWORDS)]
+        ref = self.changed_since_edit.text().strip()
+        if ref:
+            try:
+                selected_paths = select_changed_since(self.root_path, selected_paths, ref)
+            except (OSError, RuntimeError) as e:
+                QMessageBox.warning(self, s['warning'], s['git_diff_failed'].format(ref, e))
+                return
+            if not selected_paths:
+                QMessageBox.warning(self, s['warning'], s['no_changed_files'].format(ref))
+                return
+
+        # 文件名规则即时判断；内容规则使用后台检测的结果，检测未完成时不等待
+        sensitive = [p for p in selected_paths if sensitive_name_hit(p) or p in self.secret_hits]
         if sensitive:
             msg = s['sensitive_warning'].format("\n".join(sensitive[:5]))
             reply = QMessageBox.question(self, s['warning'], msg,
@@ -912,14 +2554,17 @@ class MainWindow(QMainWindow):
         self.progress_dlg.setWindowModality(Qt.WindowModal)
         self.progress_dlg.show()
 
-        self.gen_thread = GenerateThread(
-            self.root_path,
-            self.selected_paths,
-            self.file_map,
-            self.current_lang,
-            self.sensitive_checkbox.isChecked()
+        # 记下本次生成的参数，供 JSONL 等导出重新遍历文件
+        self.last_generate_args = (
+            (self.root_path, selected_paths, self.file_map, self.current_lang, self.sensitive_checkbox.isChecked()),
+            {'dedup': self.dedup_checkbox.isChecked(), 'content_cache': self.content_cache,
+             'compact': self.compact_checkbox.isChecked(), 'workers': DEFAULT_READ_WORKERS,
+             'outline_threshold': OUTLINE_DEFAULT_THRESHOLD if self.outline_checkbox.isChecked() else None},
         )
+        args, options = self.last_generate_args
+        self.gen_thread = GenerateThread(*args, **options)
         self.gen_thread.progress.connect(self.on_generate_progress)
+        self.gen_thread.stats_ready.connect(self.on_generate_stats)
         self.gen_thread.result.connect(self.on_generate_finished)
         self.gen_thread.start()
 
@@ -927,6 +2572,22 @@ class MainWindow(QMainWindow):
         if self.progress_dlg:
             self.progress_dlg.setLabelText(msg)
 
+    def on_generate_stats(self, stats):
+        s = STRINGS[self.current_lang]
+        messages = []
+        if stats.get('dedup_files'):
+            messages.append(s['dedup_saved'].format(
+                stats['dedup_files'], format_bytes(stats['dedup_bytes_saved']), stats['dedup_tokens_saved']))
+        if stats.get('compact_tokens_saved'):
+            top_path, top_saved = max(stats['compact_per_file'].items(), key=lambda x: x[1])
+            messages.append(s['compact_saved'].format(stats['compact_tokens_saved'], top_path, top_saved))
+        if stats.get('outline_files'):
+            messages.append(s['outline_saved'].format(stats['outline_files'], stats['outline_tokens_saved']))
+        if messages:
+            self.statusBar().showMessage('；'.join(messages) if self.current_lang == 'zh' else '; '.join(messages))
+        else:
+            self.statusBar().clearMessage()
+
     def on_generate_finished(self, markdown):
         self.progress_dlg.close()
         self.output_edit.setPlainText(markdown)
@@ -955,12 +2616,14 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, s['warning'], s['no_selection'])
             return
         default_name = f"{os.path.basename(self.root_path) if self.root_path else 'project'}.md"
+        filters = ["Markdown (*.md)", "Markdown gzip (*.md.gz)", "Markdown xz (*.md.xz)"]
+        if zstd_module() is not None:
+            filters.append("Markdown zstd (*.md.zst)")
         file_path, _ = QFileDialog.getSaveFileName(
-            self, s['export_md'], default_name, "Markdown (*.md)"
+            self, s['export_md'], default_name, ";;".join(filters)
         )
         if file_path:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(text)
+            write_sections([text], file_path, compression_from_path(file_path))
             QMessageBox.information(self, s['export_success'], s['export_success'].format(file_path))
 
     def export_html(self):
@@ -970,7 +2633,8 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, s['warning'], s['no_selection'])
             return
 
-        if not MARKDOWN_AVAILABLE:
+        markdown = markdown_module()
+        if markdown is None:
             QMessageBox.warning(self, s['warning'], s['export_html_missing'])
             return
 
@@ -1014,15 +2678,557 @@ code {{ font-family: monospace; }}
             # 使用 QTextDocument 生成 PDF
             doc = QTextDocument()
             doc.setPlainText(text)  # 直接纯文本，也可以转换为 HTML 更美观
+            from PySide6.QtPrintSupport import QPrinter   # 只在导出 PDF 时加载打印模块
             printer = QPrinter()
             printer.setOutputFormat(QPrinter.PdfFormat)
             printer.setOutputFileName(file_path)
             doc.print_(printer)
             QMessageBox.information(self, s['export_success'], s['export_success'].format(file_path))
 
+    def export_jsonl(self):
+        s = STRINGS[self.current_lang]
+        if not self.last_generate_args:
+            QMessageBox.warning(self, s['warning'], s['no_selection'])
+            return
+        default_name = f"{os.path.basename(self.root_path) if self.root_path else 'project'}.jsonl"
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, s['export_jsonl'], default_name, "JSONL (*.jsonl);;JSONL gzip (*.jsonl.gz)"
+        )
+        if not file_path:
+            return
+        args, options = self.last_generate_args
+        generator = MarkdownGenerator(*args, records=True, **options)
+
+        self.progress_dlg = QProgressDialog(s['exporting'], None, 0, 0, self)
+        self.progress_dlg.setWindowModality(Qt.WindowModal)
+        self.progress_dlg.show()
+        self.export_thread = ExportThread(lambda: write_jsonl(generator, file_path))
+        self.export_thread.finished_export.connect(lambda error: self.on_export_finished(error, file_path))
+        self.export_thread.start()
+
+    def on_export_finished(self, error, file_path):
+        self.progress_dlg.close()
+        s = STRINGS[self.current_lang]
+        if error:
+            QMessageBox.warning(self, s['warning'], s['export_failed'].format(error))
+        else:
+            QMessageBox.information(self, s['export_success'], s['export_success'].format(file_path))
+
+# ==================== 批量生成 ====================
+def select_paths(file_map, include=None, exclude=None, extensions=None):
+    """按 glob（匹配相对路径）和扩展名筛选文件，返回排序后的路径列表"""
+    allowed = set(extensions) if extensions else None
+    selected = []
+    for rel_path in sorted(file_map):
+        if allowed is not None and get_extension(rel_path) not in allowed:
+            continue
+        if include and not any(fnmatch.fnmatchcase(rel_path, pat) for pat in include):
+            continue
+        if exclude and any(fnmatch.fnmatchcase(rel_path, pat) for pat in exclude):
+            continue
+        selected.append(rel_path)
+    return selected
+
+def select_by_token_budget(paths, file_map, max_tokens):
+    """按顺序挑选文件，使估算 token（字节数 / 4）之和不超过预算；放不下的文件跳过，继续尝试后面较小的文件
+
+    返回 (选中路径, 跳过路径, 估算 token 数)。
+    """
+    selected, skipped, total = [], [], 0
+    for rel_path in paths:
+        tokens = file_map[rel_path][1] // 4
+        if total + tokens <= max_tokens:
+            selected.append(rel_path)
+            total += tokens
+        else:
+            skipped.append(rel_path)
+    return selected, skipped, total
+
+def _unique_name(name, names):
+    """名称重复时追加 -2、-3……，并记入 names"""
+    base, n = name, 2
+    while name in names:
+        name = f"{base}-{n}"
+        n += 1
+    names.add(name)
+    return name
+
+BATCH_PRESET_KEYS = {
+    'name', 'path', 'include', 'exclude', 'extensions', 'source', 'changed_since',
+    'lang', 'redact', 'dedup', 'tree_max_depth', 'tree_max_width', 'tree_annotate',
+    'compression', 'part_bytes', 'bundle', 'jsonl', 'index', 'compact', 'outline_threshold', 'max_tokens',
+}
+
+def _batch_jobs(config):
+    """把配置展开为每个根目录一份的完整预设（defaults 被各根目录的设置覆盖）
+
+    显式指定的 name 优先占用，由路径推导的名称再去重，避免显式名称被改成 name-2。
+    """
+    defaults = config.get('defaults', {})
+    jobs = []
+    for entry in config.get('roots', []):
+        job = dict(defaults)
+        job.update({'path': entry} if isinstance(entry, str) else entry)
+        unknown = set(job) - BATCH_PRESET_KEYS
+        if unknown:
+            raise ValueError(f"未知的批量配置项: {', '.join(sorted(unknown))}")
+        job['path'] = os.path.abspath(os.path.expanduser(job['path']))
+        jobs.append(job)
+    names = set()
+    for job in jobs:
+        if job.get('name'):
+            job['name'] = _unique_name(job['name'], names)
+    for job in jobs:
+        if not job.get('name'):
+            job['name'] = _unique_name(os.path.basename(job['path'].rstrip(os.sep)) or 'root', names)
+    return jobs
+
+def _batch_scan(job):
+    if not os.path.isdir(job['path']):
+        raise FileNotFoundError(f"目录不存在: {job['path']}")
+    start = time.perf_counter()
+    result = None
+    if job.get('source') == 'git':
+        result = scan_git_index(job['path'])
+    if result is None:
+        result = scan_directory(job['path'])
+    return result[0], time.perf_counter() - start
+
+def _batch_generate(job, file_map, output_dir, content_cache):
+    start = time.perf_counter()
+    paths = select_paths(file_map, job.get('include'), job.get('exclude'), job.get('extensions'))
+    if job.get('changed_since'):
+        paths = select_changed_since(job['path'], paths, job['changed_since'])
+    if job.get('max_tokens'):
+        paths = select_by_token_budget(paths, file_map, job['max_tokens'])[0]
+    generator = MarkdownGenerator(
+        job['path'], paths, file_map, job.get('lang', 'zh'), job.get('redact', False),
+        tree_max_depth=job.get('tree_max_depth'), tree_max_width=job.get('tree_max_width'),
+        tree_annotate=job.get('tree_annotate', False), dedup=job.get('dedup', False),
+        content_cache=content_cache, records=bool(job.get('jsonl')), compact=job.get('compact', False),
+        outline_threshold=job.get('outline_threshold'),
+    )
+    compression = job.get('compression')
+    suffix = COMPRESSION_SUFFIXES.get(compression, '')
+    output = os.path.join(output_dir, job['name'] + '.md' + suffix)
+    jsonl_path = os.path.join(output_dir, job['name'] + '.jsonl' + suffix) if job.get('jsonl') else None
+    index_path = os.path.join(output_dir, job['name'] + '.md.index.jsonl') if job.get('index') else None
+    written = write_markdown_outputs(generator, output, compression, job.get('part_bytes'), job.get('bundle'),
+                                     jsonl_path=jsonl_path, index_path=index_path, count_tokens=True)
+    return {
+        'output': written['paths'][0] if len(written['paths']) == 1 else written['paths'],
+        'selected_files': len(paths),
+        'markdown_bytes': written['bytes_in'],
+        'output_bytes': written['bytes_out'],
+        'tokens': written['tokens'],
+        'stats': generator.stats,
+        'generate_seconds': time.perf_counter() - start,
+    }
+
+def run_batch(config, output_dir=None, workers=None, log=print):
+    """批量生成：所有根目录的扫描与生成阶段共用一个有界线程池
+
+    每个根目录输出 <name>.md，另写 summary.json 汇总。返回汇总字典。
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    jobs = _batch_jobs(config)
+    output_dir = os.path.abspath(output_dir or config.get('output_dir') or 'repo2md_batch')
+    workers = workers or config.get('workers') or min(8, (os.cpu_count() or 2))
+    os.makedirs(output_dir, exist_ok=True)
+    content_cache = ContentCache()
+    results = {job['name']: {'name': job['name'], 'root': job['path']} for job in jobs}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_batch_scan, job): ('scan', job) for job in jobs}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, job = pending.pop(future)
+                result = results[job['name']]
+                try:
+                    value = future.result()
+                except Exception as e:
+                    result['error'] = f"{stage}: {e}"
+                    log(f"[{job['name']}] {stage} 失败: {e}")
+                    continue
+                if stage == 'scan':
+                    file_map, result['scan_seconds'] = value
+                    result['scanned_files'] = len(file_map)
+                    pending[pool.submit(_batch_generate, job, file_map, output_dir, content_cache)] = ('generate', job)
+                else:
+                    result.update(value)
+                    log(f"[{job['name']}] {value['selected_files']} 个文件 -> {value['output']}")
+
+    ok = [r for r in results.values() if 'error' not in r]
+    summary = {
+        'output_dir': output_dir,
+        'workers': workers,
+        'wall_seconds': time.perf_counter() - start,
+        'roots': len(jobs),
+        'succeeded': len(ok),
+        'failed': len(jobs) - len(ok),
+        'total_files': sum(r['selected_files'] for r in ok),
+        'total_output_bytes': sum(r['output_bytes'] for r in ok),
+        'total_tokens': sum(r['tokens'] for r in ok),
+        'results': list(results.values()),
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary
+
+# ==================== 本地 HTTP 服务 ====================
+SERVE_CHUNK_BYTES = 64 * 1024
+SERVE_SCAN_WAIT_SECONDS = 60
+SERVE_LIST_PARAMS = ('include', 'exclude', 'ext')
+
+class ServedRoot:
+    """已注册根目录的常驻索引；扫描完成后整体替换 index，请求线程拿到的总是完整快照"""
+
+    def __init__(self, name, path, source='fs'):
+        self.name = name
+        self.path = path
+        self.source = source
+        self.index = None       # (file_map, extensions, aggregates)
+        self.scanned_at = None
+        self.scans = 0
+        self.ready = threading.Event()
+
+    def update(self, file_map, extensions, aggregates):
+        self.index = (file_map, extensions, aggregates)
+        self.scanned_at = time.time()
+        self.scans += 1
+        self.ready.set()
+
+    def summary(self):
+        info = {'name': self.name, 'path': self.path, 'source': self.source,
+                'scans': self.scans, 'scanned_at': self.scanned_at}
+        if self.index is not None:
+            file_map, extensions, aggregates = self.index
+            root_totals = aggregates['dirs'].get('', {'files': 0, 'bytes': 0, 'tokens': 0})
+            info.update(files=root_totals['files'], bytes=root_totals['bytes'],
+                        estimated_tokens=root_totals['tokens'], extensions=extensions)
+        return info
+
+class RepoServer(QObject):
+    """服务模式的 Qt 部分：用 ScanThread 扫描各根目录，QFileSystemWatcher 发现变化后防抖重扫"""
+
+    def __init__(self, roots, debounce_ms=500, log=print):
+        super().__init__()
+        self.roots = roots      # name -> ServedRoot
+        self.debounce_ms = debounce_ms
+        self.log = log
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.timers = {}
+        self.scan_threads = {}
+        self.dirty = set()      # 扫描进行中又发生变化的根目录
+
+    def start(self):
+        for root in self.roots.values():
+            self.rescan(root)
+
+    def rescan(self, root):
+        if root.name in self.scan_threads:
+            self.dirty.add(root.name)
+            return
+        thread = ScanThread(root.path, root.source)
+        thread.finished_scan.connect(lambda fm, ext, agg, r=root: self.on_scanned(r, fm, ext, agg))
+        thread.finished.connect(lambda r=root: self.on_scan_thread_done(r))
+        self.scan_threads[root.name] = thread
+        thread.start()
+
+    def on_scanned(self, root, file_map, extensions, aggregates):
+        root.update(file_map, extensions, aggregates)
+        # 监视所有含文件的目录及其上级目录（与界面一样只监视目录）
+        dirs = {root.path}
+        for rel_path in file_map:
+            dir_path = rel_path.rpartition('/')[0]
+            while dir_path:
+                dirs.add(os.path.join(root.path, *dir_path.split('/')))
+                dir_path = dir_path.rpartition('/')[0]
+        new_dirs = dirs - set(self.watcher.directories())
+        if new_dirs:
+            self.watcher.addPaths(sorted(new_dirs))
+        self.log(f"[{root.name}] 已索引 {len(file_map)} 个文件（第 {root.scans} 次扫描）")
+
+    def on_scan_thread_done(self, root):
+        self.scan_threads.pop(root.name, None)
+        if root.name in self.dirty:
+            self.dirty.discard(root.name)
+            self.rescan(root)
+
+    def on_directory_changed(self, path):
+        root = self._root_for(path)
+        if root is None:
+            return
+        timer = self.timers.get(root.name)
+        if timer is None:
+            timer = self.timers[root.name] = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda r=root: self.rescan(r))
+        timer.start(self.debounce_ms)
+
+    def _root_for(self, path):
+        best = None
+        for root in self.roots.values():
+            if path == root.path or path.startswith(root.path.rstrip(os.sep) + os.sep):
+                if best is None or len(root.path) > len(best.path):
+                    best = root
+        return best
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+def _parse_list(value):
+    if value is None:
+        return None
+    values = value if isinstance(value, list) else [value]
+    return [part for v in values for part in str(v).split(',') if part] or None
+
+def parse_generate_request(query, body=None):
+    """把查询字符串（及可选的 JSON 请求体）解析为生成参数；参数不合法时抛出 ValueError"""
+    from urllib.parse import parse_qs
+    params = {}
+    for key, values in parse_qs(query).items():
+        params[key] = values if key in SERVE_LIST_PARAMS else values[-1]
+    if body:
+        data = json.loads(body)
+        if not isinstance(data, dict):
+            raise ValueError("请求体必须是 JSON 对象")
+        for key, value in data.items():
+            if key in SERVE_LIST_PARAMS:
+                valid = isinstance(value, str) or isinstance(value, list) and all(isinstance(v, str) for v in value)
+            elif key in ('max_tokens', 'outline_threshold'):
+                valid = isinstance(value, (int, str)) and not isinstance(value, bool)
+            elif key in ('redact', 'dedup', 'compact'):
+                valid = isinstance(value, (bool, int, str))
+            else:
+                valid = key not in ('root', 'format', 'lang') or value is None or isinstance(value, str)
+            if not valid:
+                raise ValueError(f"参数类型不正确: {key}")
+        params.update(data)
+    options = {
+        'root': params.get('root'),
+        'include': _parse_list(params.get('include')),
+        'exclude': _parse_list(params.get('exclude')),
+        'extensions': _parse_list(params.get('ext')),
+        'max_tokens': int(params['max_tokens']) if params.get('max_tokens') not in (None, '') else None,
+        'format': params.get('format', 'md'),
+        'lang': params.get('lang', 'zh'),
+        'redact': _parse_bool(params.get('redact', False)),
+        'dedup': _parse_bool(params.get('dedup', False)),
+        'compact': _parse_bool(params.get('compact', False)),
+        'outline_threshold': int(params['outline_threshold']) if params.get('outline_threshold') else None,
+    }
+    if options['format'] not in ('md', 'jsonl'):
+        raise ValueError(f"不支持的格式: {options['format']}")
+    if options['lang'] not in STRINGS:
+        raise ValueError(f"不支持的语言: {options['lang']}")
+    return options
+
+# http.server 连带导入 email、ssl 等约 30ms 的模块，只在服务模式下由 make_http_server 导入，
+# 下面两个类以 mixin 形式定义，届时再与 BaseHTTPRequestHandler / ThreadingHTTPServer 组合
+class RepoRequestHandlerMixin:
+    """GET /roots；GET|POST /files、/generate（参数见 parse_generate_request），/generate 以分块传输流式返回"""
+    protocol_version = 'HTTP/1.1'
+    server_version = 'repo2md'
+    disable_nagle_algorithm = True  # 头部与正文分开写出，保持连接时避免 Nagle + 延迟确认造成约 40ms 的停顿
+
+    def do_GET(self):
+        self._dispatch(None)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self._dispatch(self.rfile.read(length) if length else None)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _dispatch(self, body):
+        from urllib.parse import urlsplit
+        url = urlsplit(self.path)
+        try:
+            if url.path == '/roots':
+                self._send_json(200, [root.summary() for root in self.server.roots.values()])
+            elif url.path in ('/files', '/generate'):
+                options = parse_generate_request(url.query, body)
+                root, file_map, paths, skipped, tokens = self._select(options)
+                if url.path == '/files':
+                    self._send_json(200, {
+                        'root': root.name, 'estimated_tokens': tokens, 'skipped': skipped,
+                        'files': [{'path': p, 'size': file_map[p][1], 'tokens': file_map[p][1] // 4} for p in paths],
+                    })
+                else:
+                    self._stream_generate(options, root, file_map, paths, skipped, tokens)
+            else:
+                self._send_json(404, {'error': f"未知路径: {url.path}"})
+        except LookupError as e:
+            self._send_json(404, {'error': str(e)})
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+        except TimeoutError as e:
+            self._send_json(503, {'error': str(e)})
+
+    def _select(self, options):
+        roots = self.server.roots
+        name = options['root']
+        if name is None:
+            if len(roots) != 1:
+                raise ValueError("注册了多个根目录，需要指定 root 参数")
+            name = next(iter(roots))
+        root = roots.get(name)
+        if root is None:
+            raise LookupError(f"未注册的根目录: {name}")
+        if not root.ready.wait(SERVE_SCAN_WAIT_SECONDS):
+            raise TimeoutError(f"根目录仍在扫描: {name}")
+        file_map = root.index[0]
+        paths = select_paths(file_map, options['include'], options['exclude'], options['extensions'])
+        skipped, tokens = [], sum(file_map[p][1] // 4 for p in paths)
+        if options['max_tokens'] is not None:
+            paths, skipped, tokens = select_by_token_budget(paths, file_map, options['max_tokens'])
+        return root, file_map, paths, skipped, tokens
+
+    def _stream_generate(self, options, root, file_map, paths, skipped, tokens):
+        jsonl = options['format'] == 'jsonl'
+        generator = MarkdownGenerator(
+            root.path, paths, file_map, options['lang'], options['redact'],
+            dedup=options['dedup'], content_cache=self.server.content_cache, records=jsonl,
+            compact=options['compact'], outline_threshold=options['outline_threshold'],
+            workers=self.server.read_workers,
+        )
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson' if jsonl else 'text/markdown; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('X-Repo2md-Files', str(len(paths)))
+        self.send_header('X-Repo2md-Skipped', str(len(skipped)))
+        self.send_header('X-Repo2md-Estimated-Tokens', str(tokens))
+        self.end_headers()
+
+        entries = generator.iter_entries()
+        buffer, buffered = [], 0
+        try:
+            for i, (section, record) in enumerate(entries):
+                if jsonl:
+                    if record is None:
+                        continue
+                    data = json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+                else:
+                    data = (section if i == 0 else '\n' + section).encode('utf-8')
+                buffer.append(data)
+                buffered += len(data)
+                if buffered >= SERVE_CHUNK_BYTES:
+                    self._write_chunk(b''.join(buffer))
+                    buffer, buffered = [], 0
+            if buffer:
+                self._write_chunk(b''.join(buffer))
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True    # 客户端已断开，停止生成
+        except Exception:
+            # 响应头已发出，无法再返回错误状态码，只能断开连接让客户端发现输出不完整
+            self.close_connection = True
+            raise
+        finally:
+            entries.close()
+
+    def _write_chunk(self, data):
+        self.wfile.write(b'%X\r\n' % len(data) + data + b'\r\n')
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class RepoHTTPServerMixin:
+    daemon_threads = True
+
+    def __init__(self, address, handler, roots, content_cache, read_workers=1, verbose=False):
+        super().__init__(address, handler)
+        self.roots = roots
+        self.content_cache = content_cache
+        self.read_workers = read_workers
+        self.verbose = verbose
+
+def make_http_server(address, roots, content_cache, read_workers=1, verbose=False):
+    """导入 http.server 并创建监听 address 的服务器（尚未开始处理请求）"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    handler = type('RepoRequestHandler', (RepoRequestHandlerMixin, BaseHTTPRequestHandler), {})
+    server = type('RepoHTTPServer', (RepoHTTPServerMixin, ThreadingHTTPServer), {})
+    return server(address, handler, roots, content_cache, read_workers, verbose)
+
+def run_server(paths, host='127.0.0.1', port=8765, source='fs', workers=None, verbose=False, log=print):
+    """服务模式：HTTP 服务在后台线程处理请求，主线程运行 Qt 事件循环负责监视文件变化并重扫
+
+    所有根目录共享一个内容缓存；Ctrl+C 退出。
+    """
+    app = QCoreApplication.instance() or QCoreApplication([sys.argv[0]])
+    roots, names = {}, set()
+    for path in paths:
+        path = os.path.abspath(os.path.expanduser(path))
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"目录不存在: {path}")
+        name = _unique_name(os.path.basename(path.rstrip(os.sep)) or 'root', names)
+        roots[name] = ServedRoot(name, path, source)
+
+    repo_server = RepoServer(roots, log=log)
+    repo_server.start()
+    httpd = make_http_server((host, port), roots, ContentCache(), workers or DEFAULT_READ_WORKERS, verbose)
+    threading.Thread(target=httpd.serve_forever, name='repo2md-http', daemon=True).start()
+    log(f"repo2md 服务已启动: http://{host}:{httpd.server_address[1]}/ （根目录: {', '.join(roots)}）")
+    sys.stdout.flush()
+
+    # Qt 事件循环中 Python 只有在执行 Python 代码时才处理信号，用定时器定期让出控制权
+    import signal
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    signal_timer = QTimer()
+    signal_timer.timeout.connect(lambda: None)
+    signal_timer.start(200)
+    try:
+        return app.exec()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
 # ==================== 启动 ====================
-if __name__ == '__main__':
-    app = QApplication(sys.argv)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='repo2md - 项目转Markdown')
+    parser.add_argument('--batch', metavar='CONFIG', help='批量模式：按 JSON 配置为多个根目录生成 Markdown（不启动界面）')
+    parser.add_argument('--output-dir', help='批量模式输出目录（覆盖配置中的 output_dir）')
+    parser.add_argument('--workers', type=int, help='批量模式线程池大小；服务模式下为每个请求读取文件的线程数')
+    parser.add_argument('--serve', action='store_true', help='服务模式：常驻并通过本地 HTTP 按需生成（不启动界面）')
+    parser.add_argument('--root', action='append', default=[], help='服务模式注册的根目录，可重复')
+    parser.add_argument('--host', default='127.0.0.1', help='服务模式监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='服务模式端口，0 表示自动选择')
+    parser.add_argument('--source', choices=('fs', 'git'), default='fs', help='服务模式的扫描来源')
+    parser.add_argument('--verbose', action='store_true', help='服务模式打印每个请求')
+    args, qt_args = parser.parse_known_args(argv)
+
+    if args.batch:
+        with open(args.batch, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        summary = run_batch(config, output_dir=args.output_dir, workers=args.workers)
+        print(f"完成 {summary['succeeded']}/{summary['roots']}，共 {summary['total_files']} 个文件，"
+              f"{format_bytes(summary['total_output_bytes'])}，约 {summary['total_tokens']} token，"
+              f"耗时 {summary['wall_seconds']:.1f}s")
+        return 1 if summary['failed'] else 0
+
+    if args.serve:
+        if not args.root:
+            parser.error('--serve 需要至少一个 --root')
+        return run_server(args.root, args.host, args.port, args.source, args.workers, args.verbose)
+
+    app = QApplication([sys.argv[0]] + qt_args)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    QTimer.singleShot(0, window.restore_last_session)
+    return app.exec()
+
+if __name__ == '__main__':
+    sys.exit(main())